@@ -0,0 +1,669 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Collapsi solver.
+
+Every benchmark runs over the same fixed set of seeded deals so numbers are
+comparable between runs and between machines.
+
+Each benchmark also returns its timings as metrics, all "seconds per unit"
+so lower is better.  The suite runs --repeat times and every metric keeps
+its fastest round, since a single pass moves by 10-30% between runs on a
+busy machine; how far each metric's rounds spread is kept as well.
+--save PATH stores them as a JSON baseline and --compare PATH reports every
+metric against one, flagging (and exiting 1 on) any that got slower by more
+than --threshold plus that metric's spread.
+"""
+
+from collapsi_batch import evaluate_positions
+from collapsi_bitstate import BitState
+from collapsi_core import Board, Game, MoveValidator, Position, standard_deck
+from collapsi_movetable import neighbours
+from collapsi_match import play_game
+from collapsi_ordering import ORDERINGS
+from mcts_ai_player import MCTSPlayer
+from perfect_ai_player import PerfectAIPlayer, SearchCancelled
+from math import sqrt
+from typing import Dict, List, Tuple
+import argparse
+import importlib.util
+import json
+import platform
+import random
+import sys
+import threading
+import time
+import timeit
+
+import winrate
+
+Metrics = Dict[str, float]
+BASELINE_VERSION = 1
+
+
+# board sizes of the scaling benchmark
+SCALING_SIZES = (4, 5, 6)
+
+
+def seeded_deals(n_deals=200, seed=0, size=4) -> List[Tuple[int, ...]]:
+    """Return n_deals row-major value layouts of the standard deck for the board size."""
+    rng = random.Random(seed)
+    deck = list(standard_deck(size))
+    deals = []
+    for _ in range(n_deals):
+        rng.shuffle(deck)
+        deals.append(tuple(deck))
+    return deals
+
+
+def _root(values: Tuple[int, ...]) -> Tuple[int, int, int]:
+    """Starting (collapsed_mask, p0_idx, p1_idx) of a deal."""
+    board = Board(int(sqrt(len(values))))
+    board.setup_from_values(values)
+    p0, p1 = board.player_positions[0], board.player_positions[1]
+    return 0, p0.row * board.size + p0.col, p1.row * board.size + p1.col
+
+
+MINIMAX_ENGINES = ("iterative", "recursive")
+
+
+def bench_engines(deals: List[Tuple[int, ...]]) -> Metrics:
+    """Cold root solve of every deal with each minimax PerfectAIPlayer engine."""
+
+    print("Solver engines: cold root solve per deal")
+    print("=" * 50)
+
+    results = {}
+    timings = {}
+    for engine in MINIMAX_ENGINES:
+        perfect_ai = PerfectAIPlayer(0, engine=engine)
+        nodes = 0
+        lookups = 0
+        elapsed = 0.0
+        results[engine] = []
+        for values in deals:
+            perfect_ai._initialise_from_values(values)
+            collapsed_mask, p0_idx, p1_idx = _root(values)
+            start_time = time.perf_counter()
+            result = perfect_ai._solve(collapsed_mask, p0_idx, p1_idx, 0)
+            elapsed += time.perf_counter() - start_time
+            stats = perfect_ai.search_stats()
+            nodes += stats["nodes"]
+            lookups += stats["lookups"]
+            results[engine].append(result)
+        timings[engine] = elapsed
+        print(f"{engine:>10}: {elapsed:.3f} s total, {elapsed/len(deals)*1000:.2f} ms/deal, "
+              f"{nodes} nodes, {lookups} lookups, {nodes/elapsed:,.0f} nodes/s")
+
+    baseline = timings["recursive"]
+    for engine in MINIMAX_ENGINES:
+        if results[engine] != results["recursive"]:
+            print(f"WARNING: {engine} engine disagrees with the recursive engine")
+        print(f"{engine:>10}: {baseline/timings[engine]:.2f}x vs recursive")
+    return {f"solve.{engine}_s_per_deal": timings[engine] / len(deals) for engine in MINIMAX_ENGINES}
+
+
+def bench_ordering(deals: List[Tuple[int, ...]]) -> Metrics:
+    """Cold root solve of every deal under each move ordering (iterative engine)."""
+
+    print("Move ordering: cold root solve per deal")
+    print("=" * 50)
+
+    results = {}
+    timings = {}
+    for ordering in ORDERINGS:
+        perfect_ai = PerfectAIPlayer(0, ordering=ordering)
+        nodes = 0
+        elapsed = 0.0
+        results[ordering] = []
+        for values in deals:
+            perfect_ai._initialise_from_values(values)
+            start_time = time.perf_counter()
+            results[ordering].append(perfect_ai._solve(*_root(values), 0)[0])
+            elapsed += time.perf_counter() - start_time
+            nodes += perfect_ai.search_stats()["nodes"]
+        timings[ordering] = elapsed
+        print(f"{ordering:>10}: {elapsed/len(deals)*1000:.2f} ms/deal, {nodes} nodes")
+
+    baseline = timings["none"]
+    for ordering in ORDERINGS:
+        if results[ordering] != results["none"]:
+            print(f"WARNING: {ordering} ordering changes a result")
+        print(f"{ordering:>10}: {baseline/timings[ordering]:.2f}x vs none")
+    return {f"ordering.{ordering}_s_per_deal": timings[ordering] / len(deals) for ordering in ORDERINGS}
+
+
+def bench_scaling(n_deals=3, time_limit=30.0, seed=0) -> Metrics:
+    """Cold root solves against board size, each stopped after *time_limit* seconds.
+
+    Only sizes whose deals were all solved report a metric, so a size that
+    stops finishing in time fails --compare; for the others the nodes
+    reached within the limit are a lower bound.
+    """
+
+    print(f"Board size scaling: cold root solve, {time_limit:.0f} s limit per deal")
+    print("=" * 50)
+
+    metrics = {}
+    for size in SCALING_SIZES:
+        solved = 0
+        nodes = 0
+        elapsed = 0.0
+        for values in seeded_deals(n_deals, seed, size):
+            perfect_ai = PerfectAIPlayer(0)
+            perfect_ai._initialise_from_values(values, size)
+            timer = threading.Timer(time_limit, perfect_ai.cancel_move)
+            timer.start()
+            start_time = time.perf_counter()
+            try:
+                perfect_ai._solve(*_root(values), 0)
+                solved += 1
+            except SearchCancelled:
+                pass
+            elapsed += time.perf_counter() - start_time
+            timer.cancel()
+            nodes += perfect_ai.search_stats()["nodes"]
+        print(f"{size}x{size}: solved {solved}/{n_deals}, {nodes/n_deals:,.0f} nodes/deal, "
+              f"{elapsed/n_deals:.2f} s/deal, {nodes/elapsed:,.0f} nodes/s")
+        if solved == n_deals:
+            metrics[f"scaling.{size}x{size}_s_per_deal"] = elapsed / n_deals
+    return metrics
+
+
+def bench_retrograde(deals: List[Tuple[int, ...]]) -> Metrics:
+    """Whole-deal retrograde tables against memoised minimax.
+
+    For each engine: the cold solve of the root, then a full perfect-vs-perfect
+    game (every get_move) on that one solved deal.  Minimax only visits the
+    states reachable from the root, the retrograde solver builds all of them,
+    so it pays off when many positions of a deal are queried.
+    """
+
+    print("Retrograde vs minimax: per deal")
+    print("=" * 50)
+
+    results = {}
+    metrics = {}
+    for engine in ("iterative", "retrograde"):
+        perfect_ai = PerfectAIPlayer(0, engine=engine)
+        solve_time = play_time = 0.0
+        moves = 0
+        results[engine] = []
+        for values in deals:
+            perfect_ai._initialise_from_values(values)
+            start_time = time.perf_counter()
+            results[engine].append(perfect_ai._solve(*_root(values), 0)[0])
+            solve_time += time.perf_counter() - start_time
+
+            game = Game()
+            game.start_from_values(values)
+            start_time = time.perf_counter()
+            while not game.is_game_over():
+                game.make_move(perfect_ai.get_move(game, game.get_valid_moves()))
+                moves += 1
+            play_time += time.perf_counter() - start_time
+        print(f"{engine:>10}: solve {solve_time/len(deals)*1000:.1f} ms/deal, "
+              f"then {play_time/moves*1e6:.0f} us/move over {moves} moves")
+        metrics[f"retrograde.{engine}_solve_s_per_deal"] = solve_time / len(deals)
+        metrics[f"retrograde.{engine}_play_s_per_move"] = play_time / moves
+
+    if results["retrograde"] != results["iterative"]:
+        print("WARNING: retrograde solver disagrees with minimax")
+    return metrics
+
+
+def seeded_positions(deals: List[Tuple[int, ...]], seed=0) -> List[Game]:
+    """One game per deal, advanced by a seeded random number of random moves."""
+    rng = random.Random(seed)
+    games = []
+    for values in deals:
+        game = Game()
+        game.start_from_values(values)
+        for _ in range(rng.randrange(8)):
+            moves = game.get_valid_moves()
+            if len(moves) < 2:
+                break
+            game.make_move(rng.choice(moves))
+        games.append(game)
+    return games
+
+
+# ---- reference implementations: DFS move generation before the walk tables
+
+
+def _reference_possible_moves(board: Board, start_pos: Position, steps: int,
+                              current_player: int) -> List[List[Position]]:
+    all_paths = []
+    visited = {start_pos}
+    current_path = []
+
+    def dfs(pos: Position, remaining_steps: int):
+        if remaining_steps == 0:
+            if pos != start_pos and not board.get_card(pos).is_collapsed:
+                if board.player_positions[1 - current_player] != pos:
+                    all_paths.append(current_path[:])
+            return
+        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            new_pos = board.wrap_position(Position(pos.row + dr, pos.col + dc))
+            if new_pos not in visited:
+                card = board.get_card(new_pos)
+                if card and not card.is_collapsed:
+                    visited.add(new_pos)
+                    current_path.append(new_pos)
+                    dfs(new_pos, remaining_steps - 1)
+                    current_path.pop()
+                    visited.remove(new_pos)
+
+    dfs(start_pos, steps)
+    return all_paths
+
+
+def _reference_generate_moves(nbrs, collapsed: int, start_idx: int, steps: int,
+                              opponent_idx: int) -> List[Tuple[int, ...]]:
+    res = []
+    stack = [(start_idx, steps, collapsed | (1 << start_idx), ())]
+    while stack:
+        cur, left, vis, path = stack.pop()
+        if left == 0:
+            if cur != opponent_idx:
+                res.append(path)
+            continue
+        for nxt in reversed(nbrs[cur]):
+            if not vis & (1 << nxt):
+                stack.append((nxt, left - 1, vis | (1 << nxt), path + (nxt,)))
+    return res
+
+
+def bench_move_generation(deals: List[Tuple[int, ...]], repeat=20) -> Metrics:
+    """Per-call cost of walk-table move generation against the old DFS."""
+
+    print("Move generation: walk tables vs DFS, per call")
+    print("=" * 50)
+
+    games = seeded_positions(deals)
+    nbrs = neighbours(4)
+    core_args = []
+    solver_args = []
+    for game in games:
+        perfect_ai = PerfectAIPlayer(0)
+        perfect_ai._initialise_from_game(game)
+        collapsed_mask, p0_idx, p1_idx = perfect_ai._encode_board(game)
+        start_idx, opponent_idx = (p0_idx, p1_idx) if game.current_player == 0 else (p1_idx, p0_idx)
+        pos = game.get_current_player_position()
+        steps = game.get_required_steps()
+        core_args.append((game.board, pos, steps, game.current_player))
+        solver_args.append((perfect_ai, collapsed_mask, start_idx, steps, opponent_idx))
+
+        if MoveValidator.get_possible_moves(*core_args[-1]) != _reference_possible_moves(*core_args[-1]):
+            print("WARNING: MoveValidator disagrees with the reference DFS")
+
+    def run_core(func):
+        for args in core_args:
+            func(*args)
+
+    def run_solver_table():
+        for perfect_ai, collapsed, start, steps, opponent in solver_args:
+            perfect_ai._generate_moves(collapsed, start, opponent)
+
+    def run_solver_dfs():
+        for perfect_ai, collapsed, start, steps, opponent in solver_args:
+            _reference_generate_moves(nbrs, collapsed, start, steps, opponent)
+
+    calls = len(games) * repeat
+    rows = [
+        ("MoveValidator", lambda: run_core(_reference_possible_moves),
+         lambda: run_core(MoveValidator.get_possible_moves)),
+        ("solver", run_solver_dfs, run_solver_table),
+    ]
+    metrics = {}
+    for label, dfs, table in rows:
+        dfs_time = timeit.timeit(dfs, number=repeat) / calls
+        table_time = timeit.timeit(table, number=repeat) / calls
+        print(f"{label:>14}: DFS {dfs_time*1e6:.2f} us/call, table {table_time*1e6:.2f} us/call, "
+              f"{dfs_time/table_time:.1f}x faster")
+        metrics[f"move_generation.{label}_s_per_call"] = table_time
+    return metrics
+
+
+def bench_playouts(deals: List[Tuple[int, ...]], seed=0) -> Metrics:
+    """Random self-play from every deal on Game objects and on BitState."""
+
+    print("Random playouts: Game vs BitState")
+    print("=" * 50)
+
+    timings = {}
+    for label in ("Game", "BitState"):
+        rng = random.Random(seed)
+        positions = 0
+        start_time = time.perf_counter()
+        for values in deals:
+            if label == "Game":
+                game = Game()
+                game.start_from_values(values)
+                while not game.is_game_over():
+                    game.make_move(rng.choice(game.get_valid_moves()))
+                    positions += 1
+            else:
+                game = Game()
+                game.start_from_values(values)
+                state = BitState.from_game(game)
+                moves = state.legal_moves()
+                while moves:
+                    state = state.apply(rng.choice(moves))
+                    moves = state.legal_moves()
+                    positions += 1
+        timings[label] = time.perf_counter() - start_time
+        print(f"{label:>10}: {positions / timings[label]:,.0f} positions/s")
+
+    print(f"{'BitState':>10}: {timings['Game'] / timings['BitState']:.1f}x vs Game")
+    return {f"playouts.{label}_s_per_deal": timings[label] / len(deals) for label in timings}
+
+
+def bench_move_validation(deals: List[Tuple[int, ...]], repeat=20) -> Metrics:
+    """MoveValidator.is_valid_move over every legal move of the seeded positions."""
+
+    print("Move validation: is_valid_move per call")
+    print("=" * 50)
+
+    calls = []
+    for game in seeded_positions(deals):
+        start_pos = game.get_current_player_position()
+        for path in game.get_valid_moves():
+            calls.append((game.board, start_pos, path, game.current_player))
+
+    def run():
+        for args in calls:
+            MoveValidator.is_valid_move(*args)
+
+    per_call = timeit.timeit(run, number=repeat) / (len(calls) * repeat)
+    print(f"{'is_valid_move':>14}: {per_call*1e6:.2f} us/call over {len(calls)} moves")
+    return {"move_validation.is_valid_move_s_per_call": per_call}
+
+
+def bench_make_move(deals: List[Tuple[int, ...]], seed=0) -> Metrics:
+    """Game.make_move (validation, collapse and game-over check) along seeded random games."""
+
+    print("Game.make_move per call")
+    print("=" * 50)
+
+    rng = random.Random(seed)
+    games = []
+    for values in deals:
+        game = Game()
+        game.start_from_values(values)
+        while not game.is_game_over():
+            game.make_move(rng.choice(game.get_valid_moves()))
+        games.append((values, [entry["path"] for entry in game.move_history]))
+
+    elapsed = 0.0
+    calls = 0
+    perf_counter = time.perf_counter
+    for values, paths in games:
+        game = Game()
+        game.start_from_values(values)
+        for path in paths:
+            start_time = perf_counter()
+            game.make_move(path)
+            elapsed += perf_counter() - start_time
+        calls += len(paths)
+
+    print(f"{'make_move':>14}: {elapsed/calls*1e6:.2f} us/call over {calls} moves")
+    return {"make_move.s_per_call": elapsed / calls}
+
+
+def bench_winrate(n_samples=200, seed=0) -> Metrics:
+    """End-to-end winrate.py sampling throughput on one process."""
+
+    print("winrate.py: sampled deals, single process")
+    print("=" * 50)
+
+    winrate._init_worker()
+    start_time = time.perf_counter()
+    deals = winrate._solve_sample_range((seed, 0, n_samples))[0]
+    elapsed = time.perf_counter() - start_time
+    print(f"{'sampling':>14}: {deals/elapsed:.1f} deals/sec")
+    return {"winrate.s_per_deal": elapsed / deals}
+
+
+def bench_batch(deals: List[Tuple[int, ...]], seed=0) -> Metrics:
+    """Evaluate every position of one random game per deal, batched and one by one."""
+
+    print("Batch evaluation: every position of a random game per deal")
+    print("=" * 50)
+
+    rng = random.Random(seed)
+    states = []
+    for values in deals:
+        game = Game()
+        game.start_from_values(values)
+        state = BitState.from_game(game)
+        states.append(state)
+        while state.legal_moves():
+            state = state.apply(rng.choice(state.legal_moves()))
+            states.append(state)
+
+    start_time = time.perf_counter()
+    for _ in evaluate_positions(states):
+        pass
+    batched = time.perf_counter() - start_time
+
+    # the same positions with the solver re-initialised for each one
+    perfect_ai = PerfectAIPlayer(0)
+    start_time = time.perf_counter()
+    for state in states:
+        perfect_ai._initialise_from_values(state.values)
+        perfect_ai._solve(state.collapsed, state.p0, state.p1, state.current)
+    ungrouped = time.perf_counter() - start_time
+
+    print(f"{'batched':>10}: {len(states) / batched:,.0f} positions/s over {len(states)} positions")
+    print(f"{'ungrouped':>10}: {len(states) / ungrouped:,.0f} positions/s "
+          f"({ungrouped / batched:.2f}x the batched time)")
+    return {"batch.s_per_position": batched / len(states),
+            "batch.ungrouped_s_per_position": ungrouped / len(states)}
+
+
+def bench_mcts(deals: List[Tuple[int, ...]], playouts=2000) -> Metrics:
+    """MCTSPlayer playouts/s from each deal's root, then its games against PerfectAIPlayer.
+
+    Each deal is played with both seatings.  Perfect play wins exactly one
+    seat of every deal, so MCTS can win at most one game per deal.
+    """
+
+    print(f"MCTS: {playouts} playouts per move")
+    print("=" * 50)
+
+    total_playouts = 0
+    elapsed = 0.0
+    for i, values in enumerate(deals):
+        mcts = MCTSPlayer(0, time_budget=None, playouts=playouts, seed=i)
+        game = Game()
+        game.start_from_values(values)
+        mcts.get_move(game, game.get_valid_moves())
+        stats = mcts.search_stats()
+        total_playouts += stats["playouts"]
+        elapsed += stats["seconds"]
+    print(f"{'search':>10}: {total_playouts / elapsed:,.0f} playouts/s")
+
+    wins = 0
+    think_time = 0.0
+    moves = 0
+    for i, values in enumerate(deals):
+        for seat in (0, 1):
+            players = [PerfectAIPlayer(0), PerfectAIPlayer(1)]
+            players[seat] = MCTSPlayer(seat, time_budget=None, playouts=playouts, seed=i)
+            game = Game()
+            game.start_from_values(values)
+            winner, seconds, counts = play_game(players, game)
+            wins += winner == seat
+            think_time += seconds[seat]
+            moves += counts[seat]
+    print(f"{'vs perfect':>10}: won {wins} of {len(deals)} winnable games "
+          f"({wins/len(deals)*100:.0f}%), {think_time/moves*1000:.1f} ms/move")
+    return {"mcts.s_per_playout": elapsed / total_playouts, "mcts.s_per_move": think_time / moves}
+
+
+# ---- baselines ---------------------------------------------------------------
+
+
+def save_baseline(path: str, metrics: Metrics, spread: Metrics, corpus: Dict[str, int], repeat: int):
+    with open(path, "w") as f:
+        json.dump({
+            "version": BASELINE_VERSION,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "corpus": corpus,
+            "repeat": repeat,
+            "metrics": metrics,
+            "spread": spread,
+        }, f, indent=2, sort_keys=True)
+    print(f"Baseline with {len(metrics)} metrics written to {path}")
+
+
+def compare_baseline(path: str, metrics: Metrics, spread: Metrics, corpus: Dict[str, int],
+                     threshold: float) -> List[str]:
+    """Print every metric against the baseline; return the names that regressed.
+
+    A metric regresses when it got slower by more than *threshold* plus the
+    larger of its spread between rounds in the baseline and in this run, so
+    the metrics that wander most on this machine need a bigger change to
+    fail.  A baseline metric this run did not report regresses too.
+    """
+
+    print(f"Comparison with {path} (regression above +{threshold*100:.0f}% plus each metric's spread)")
+    print("=" * 50)
+
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"{path} is not a version {BASELINE_VERSION} benchmark baseline")
+    if baseline["corpus"] != corpus:
+        print(f"WARNING: baseline corpus {baseline['corpus']} differs from this run's {corpus}")
+
+    regressions = []
+    for name in sorted(set(metrics) | set(baseline["metrics"])):
+        old = baseline["metrics"].get(name)
+        new = metrics.get(name)
+        if old is None:
+            print(f"{name:>42}: only in this run")
+            continue
+        if new is None:
+            # e.g. a scaling size whose deals no longer finish within the limit
+            print(f"{name:>42}: {old:.3e} -> missing in this run  REGRESSION")
+            regressions.append(name)
+            continue
+        change = new / old - 1
+        noise = max(baseline.get("spread", {}).get(name, 0.0), spread.get(name, 0.0))
+        flag = ""
+        if change > threshold + noise:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:>42}: {old:.3e} -> {new:.3e} ({change*100:+.1f}%, spread {noise*100:.0f}%){flag}")
+    print(f"\n{len(regressions)} regression(s)")
+    return regressions
+
+
+def run_benchmarks(args: argparse.Namespace, deals: List[Tuple[int, ...]]) -> Metrics:
+    """One round of every benchmark selected on the command line."""
+    metrics: Metrics = {}
+    metrics.update(bench_move_generation(deals))
+    print()
+    metrics.update(bench_move_validation(deals))
+    print()
+    metrics.update(bench_make_move(deals))
+    print()
+    metrics.update(bench_playouts(deals))
+    print()
+    metrics.update(bench_engines(deals))
+    print()
+    metrics.update(bench_ordering(deals))
+    if args.retrograde_deals:
+        print()
+        metrics.update(bench_retrograde(deals[:args.retrograde_deals]))
+    if args.winrate_samples:
+        print()
+        metrics.update(bench_winrate(args.winrate_samples, args.seed))
+    if args.mcts_deals:
+        print()
+        metrics.update(bench_mcts(deals[:args.mcts_deals]))
+    if args.batch_deals:
+        print()
+        metrics.update(bench_batch(deals[:args.batch_deals], args.seed))
+    if args.scaling_deals:
+        print()
+        metrics.update(bench_scaling(args.scaling_deals, args.scaling_limit, args.seed))
+
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deals", type=int, default=200,
+                        help="number of seeded deals (default: 200)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the deal corpus (default: 0)")
+    parser.add_argument("--retrograde-deals", type=int, default=20,
+                        help="deals for the retrograde comparison, 0 to skip; "
+                             "skipped without NumPy (default: 20)")
+    parser.add_argument("--winrate-samples", type=int, default=200,
+                        help="deals for the end-to-end winrate.py throughput, 0 to skip (default: 200)")
+    parser.add_argument("--mcts-deals", type=int, default=20,
+                        help="deals for the MCTS playout rate and games against the Perfect AI, "
+                             "0 to skip (default: 20)")
+    parser.add_argument("--batch-deals", type=int, default=50,
+                        help="deals whose random games are evaluated by the batch API, 0 to skip "
+                             "(default: 50)")
+    parser.add_argument("--scaling-deals", type=int, default=0,
+                        help=f"deals per board size {SCALING_SIZES} for the scaling benchmark, "
+                             "0 to skip (default: 0)")
+    parser.add_argument("--scaling-limit", type=float, default=30.0,
+                        help="seconds before a scaling solve is stopped (default: 30)")
+    parser.add_argument("--save", metavar="PATH", default=None,
+                        help="write this run's metrics to a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", default=None,
+                        help="compare this run with a JSON baseline; exit 1 on regressions")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="rounds of the whole suite; each metric keeps its fastest round "
+                             "(default: 3)")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown counted as a regression (default: 0.10)")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    if args.retrograde_deals and importlib.util.find_spec("numpy") is None:
+        print("NumPy is not installed; skipping the retrograde benchmark (--retrograde-deals 0)\n")
+        args.retrograde_deals = 0
+
+    deals = seeded_deals(args.deals, args.seed)
+    corpus = {"deals": args.deals, "seed": args.seed, "retrograde_deals": args.retrograde_deals,
+              "winrate_samples": args.winrate_samples, "mcts_deals": args.mcts_deals,
+              "batch_deals": args.batch_deals, "scaling_deals": args.scaling_deals,
+              "scaling_limit": args.scaling_limit}
+    rounds: List[Metrics] = []
+    for round_idx in range(args.repeat):
+        if args.repeat > 1:
+            print(f"Round {round_idx + 1} of {args.repeat}")
+            print("#" * 50 + "\n")
+        rounds.append(run_benchmarks(args, deals))
+        print()
+    # a metric may be missing from some rounds (a scaling size whose deals did
+    # not all finish in time), so each one is taken over the rounds it is in
+    metrics = {}
+    spread = {}
+    for name in sorted(set().union(*rounds)):
+        values = [r[name] for r in rounds if name in r]
+        metrics[name] = min(values)
+        spread[name] = max(values) / metrics[name] - 1
+    if args.repeat > 1:
+        print(f"Metrics are the fastest of {args.repeat} rounds")
+
+    if args.save:
+        print()
+        save_baseline(args.save, metrics, spread, corpus, args.repeat)
+    if args.compare:
+        print()
+        if compare_baseline(args.compare, metrics, spread, corpus, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Batch evaluation of Collapsi positions.
+
+evaluate_positions() takes any iterable of encoded positions
+
+    (values, collapsed, p0, p1, side)
+
+that is the deal's row-major card values, the collapsed-card mask, the two
+pawns' cells and the player to move, the state PerfectAIPlayer searches
+(BitState instances are accepted too).  It yields one Evaluation per
+position, lazily and in input order.  Positions share a solver per deal
+from a SolverService that also keeps the last RETAINED_DEALS deals, so a
+log of whole games costs about one solve per game instead of one per
+position; the input only needs to keep each game's positions together.
+
+With ``workers > 1`` the positions are cut into chunks, at deal boundaries
+where possible, and evaluated on a process pool whose processes each hold
+their own service.  Only IN_FLIGHT chunks per worker are queued at a time,
+so the input is read no faster than the results are consumed.
+"""
+
+from collections import deque
+from itertools import groupby
+from math import sqrt
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+import multiprocessing
+
+from collapsi_bitstate import BitState
+from collapsi_tablebase import Tablebase
+from perfect_ai_player import PerfectAIPlayer, SolverService
+
+EncodedState = Tuple[Tuple[int, ...], int, int, int, int]  # values, collapsed, p0, p1, side
+
+# deals each service keeps after their positions are done
+RETAINED_DEALS = 16
+# positions per chunk sent to a worker process
+CHUNK_SIZE = 1000
+# chunks queued per worker process
+IN_FLIGHT = 4
+
+
+class Evaluation(NamedTuple):
+    state: EncodedState
+    value: int  # +1 / -1 for the side to move
+    # the path PerfectAIPlayer plays, as cell indices: a winning move, or when
+    # lost its delaying move; None only when the side to move is stuck
+    best: Optional[Tuple[int, ...]]
+
+
+def encode_state(state: Union[EncodedState, Sequence, BitState]) -> EncodedState:
+    """A position as a checked (values, collapsed, p0, p1, side) tuple."""
+    if isinstance(state, BitState):
+        values, collapsed, p0, p1, side = state.values, state.collapsed, state.p0, state.p1, state.current
+    else:
+        values, collapsed, p0, p1, side = state
+        values = tuple(values)
+    cells = len(values)
+    if int(sqrt(cells)) ** 2 != cells or not 0 <= collapsed < 1 << cells \
+            or not (0 <= p0 < cells and 0 <= p1 < cells) or p0 == p1 or side not in (0, 1) \
+            or (collapsed >> p0 | collapsed >> p1) & 1:
+        raise ValueError(f"not a Collapsi position: {state!r}")
+    return values, collapsed, p0, p1, side
+
+
+def _evaluate(service: SolverService, states: Iterable[EncodedState]) -> Iterator[Evaluation]:
+    """Evaluate encoded states in order, with one solver per run of a deal."""
+    for values, run in groupby(states, key=lambda state: state[0]):
+        solver = service.acquire(values, int(sqrt(len(values))))
+        try:
+            for state in run:
+                value, best = solver._solve_with_tablebase(*state[1:])
+                yield Evaluation(state, value, best)
+        finally:
+            service.release(solver)
+
+
+def _chunks_by_deal(states: Iterable[EncodedState], chunk_size: int) -> Iterator[List[EncodedState]]:
+    """Chunks that end at a deal change once they hold chunk_size states, or at twice that."""
+    chunk: List[EncodedState] = []
+    for state in states:
+        if len(chunk) >= chunk_size and (state[0] != chunk[-1][0] or len(chunk) >= 2 * chunk_size):
+            yield chunk
+            chunk = []
+        chunk.append(state)
+    if chunk:
+        yield chunk
+
+
+# ---- worker processes ----------------------------------------------------
+
+_worker_service: Optional[SolverService] = None
+
+
+def _init_worker(engine: str, tablebase_path: Optional[str], cache_entries: Optional[int],
+                 retain: int):
+    global _worker_service
+    _worker_service = _make_service(engine, tablebase_path, cache_entries, retain)
+
+
+def _evaluate_chunk(chunk: List[EncodedState]) -> List[Tuple[int, Optional[Tuple[int, ...]]]]:
+    return [(result.value, result.best) for result in _evaluate(_worker_service, chunk)]
+
+
+def _collect(chunk: List[EncodedState], results) -> Iterator[Evaluation]:
+    for state, (value, best) in zip(chunk, results.get()):
+        yield Evaluation(state, value, best)
+
+
+def _make_service(engine: str, tablebase_path: Optional[str], cache_entries: Optional[int],
+                  retain: int) -> SolverService:
+    tablebase = Tablebase(tablebase_path, readonly=True) if tablebase_path else None
+    return SolverService(engine=engine, tablebase=tablebase, cache_entries=cache_entries, retain=retain)
+
+
+# ---- public API ----------------------------------------------------------
+
+
+def evaluate_positions(
+    states: Iterable[Union[EncodedState, Sequence, BitState]],
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    engine: str = "iterative",
+    tablebase_path: Optional[str] = None,
+    cache_entries: Optional[int] = None,
+    retain: int = RETAINED_DEALS,
+) -> Iterator[Evaluation]:
+    """Yield the perfect-play Evaluation of every position, in input order.
+
+    A lost position still gets the move the solver would play there as
+    *best*; test *value*, not *best*, for the outcome.
+
+    Raises ValueError, when its turn comes, for a state that is not a
+    position.  *tablebase_path* is opened read-only, so positions are
+    answered from it where possible but solving a deal's root just to record
+    it is skipped; *cache_entries* caps each solver's cache.
+    """
+    if engine not in PerfectAIPlayer.ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {PerfectAIPlayer.ENGINES}")
+    states = map(encode_state, states)
+    if workers <= 1:
+        yield from _evaluate(_make_service(engine, tablebase_path, cache_entries, retain), states)
+        return
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                initargs=(engine, tablebase_path, cache_entries, retain))
+    pending = deque()
+    try:
+        for chunk in _chunks_by_deal(states, chunk_size):
+            pending.append((chunk, pool.apply_async(_evaluate_chunk, (chunk,))))
+            if len(pending) >= IN_FLIGHT * workers:
+                yield from _collect(*pending.popleft())
+        while pending:
+            yield from _collect(*pending.popleft())
+    finally:
+        pool.terminate()
@@ -0,0 +1,104 @@
+"""
+Compact immutable Collapsi positions.
+
+A BitState is the same encoding PerfectAIPlayer searches on,
+
+    (collapsed_mask, p0_idx, p1_idx, player_to_move)
+
+plus a reference to the deal's row-major card values, which every state of
+the deal shares.  It is a tuple, so states are hashable, cheap to create and
+never mutated: apply() returns a new state.  Moves are paths of cell indices
+(index = row*size + col), as produced by legal_moves().
+
+Converting to and from Game is lossless for the position itself; a Game's
+move history is not part of the state.
+"""
+
+from functools import lru_cache
+from math import sqrt
+from typing import List, NamedTuple, Optional, Tuple
+
+from collapsi_core import Game, GameState, Position
+from collapsi_movetable import Walk, walk_table
+
+Move = Tuple[int, ...]
+
+
+@lru_cache(maxsize=1024)
+def _deal_walks(values: Tuple[int, ...]) -> Tuple[Tuple[Walk, ...], ...]:
+    """Walks leaving each cell for that cell's card value."""
+    size = int(sqrt(len(values)))
+    return tuple(walk_table(size, value)[i] for i, value in enumerate(values))
+
+
+class BitState(NamedTuple):
+    collapsed: int
+    p0: int
+    p1: int
+    current: int
+    values: Tuple[int, ...]
+
+    # ---- conversion ------------------------------------------------------
+
+    @classmethod
+    def from_game(cls, game: Game) -> "BitState":
+        board = game.board
+        s = board.size
+        values = tuple(board.grid[r][c].value.value for r in range(s) for c in range(s))
+        p0 = board.player_positions[0]
+        p1 = board.player_positions[1]
+        return cls(board.collapsed_mask(), p0.row * s + p0.col, p1.row * s + p1.col,
+                   game.current_player, values)
+
+    def to_game(self) -> Game:
+        s = self.size
+        # the deal's own cards, so a custom deck survives a later start_game()
+        game = Game(s, tuple(sorted(self.values)))
+        game.start_from_values(self.values)
+        for i in range(s * s):
+            if self.collapsed >> i & 1:
+                game.board.grid[i // s][i % s].is_collapsed = True
+        game.board.player_positions = {0: Position(self.p0 // s, self.p0 % s),
+                                       1: Position(self.p1 // s, self.p1 % s)}
+        game.current_player = self.current
+        game.invalidate_moves()
+        if self.is_terminal():
+            game.state = GameState.FINISHED
+            game.winner = 1 - self.current
+        return game
+
+    # ---- queries ---------------------------------------------------------
+
+    @property
+    def size(self) -> int:
+        return int(sqrt(len(self.values)))
+
+    def legal_moves(self) -> List[Move]:
+        """Every legal path for the player to move."""
+        collapsed = self.collapsed
+        start, opponent = (self.p0, self.p1) if self.current == 0 else (self.p1, self.p0)
+        return [
+            path
+            for walk_mask, end, path in _deal_walks(self.values)[start]
+            if not walk_mask & collapsed and end != opponent
+        ]
+
+    def is_terminal(self) -> bool:
+        """True when the player to move has no legal move (and so has lost)."""
+        collapsed = self.collapsed
+        start, opponent = (self.p0, self.p1) if self.current == 0 else (self.p1, self.p0)
+        return not any(
+            not walk_mask & collapsed and end != opponent
+            for walk_mask, end, path in _deal_walks(self.values)[start]
+        )
+
+    def winner(self) -> Optional[int]:
+        return 1 - self.current if self.is_terminal() else None
+
+    # ---- transitions -----------------------------------------------------
+
+    def apply(self, move: Move) -> "BitState":
+        """State after the player to move plays *move*; legality is not checked."""
+        if self.current == 0:
+            return BitState(self.collapsed | (1 << self.p0), move[-1], self.p1, 1, self.values)
+        return BitState(self.collapsed | (1 << self.p1), self.p0, move[-1], 0, self.values)
@@ -0,0 +1,288 @@
+"""
+Opening book: the solved first moves of every deal.
+
+Without a book the first get_move of a game pays for a whole cold solve of
+the deal.  The book stores, per canonical deal (collapsi_symmetry's
+canonical_deal), the root outcome, the first player's best first move and,
+optionally, the second player's best reply to each possible first move.
+A PerfectAIPlayer given a book answers both players' first moves from it
+and solves the rest of the deal on a background thread.
+
+The pawns start on Jacks, so a first move steps onto one of the torus
+neighbours of the starting cell (first_moves).  A move is stored as its
+landing cell; the player picks its own path there.  A book file is
+
+``header``
+    magic, version, board size, flags and the number of deals
+``keys``
+    the sorted uint64 deal codes (pack_deal)
+``moves``
+    per deal, in key order: the root move byte followed, if the book has
+    replies, by one reply byte per first move
+
+A move byte is the landing cell in its low bits (NO_MOVE when the mover is
+lost) with WIN set when the mover wins.  Opening a book only maps the file;
+a lookup is a binary search over the mapped keys, a few microseconds.
+Build one with::
+
+    python collapsi_book.py opening.book --workers 8
+
+A 4x4 book covers every deal class of collapsi_symmetry's
+enumerate_deal_classes at 13 bytes a deal.  Keys pack two bits per card, so
+boards up to 5x5 fit.
+"""
+
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from array import array
+import argparse
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import time
+
+from collapsi_core import CardValue, standard_deck
+from collapsi_movetable import walk_table
+from collapsi_symmetry import PAWN_MARK, canonical_deal, decode_deal, enumerate_deal_classes
+
+MAGIC = b"CLPSOB1\0"
+HEADER = struct.Struct("<8sHBBQ")  # magic, version, board size, flags, deals
+HEADER_SIZE = 32
+VERSION = 1
+REPLIES = 1  # flag: every deal also stores the replies to each first move
+
+WIN = 0x80
+NO_MOVE = 0x7F
+
+# random deals dealt per deal class wanted before a sample gives up, should
+# it ask for nearly every class of the board
+SAMPLE_DRAWS = 20
+
+Move = Tuple[int, Optional[int]]  # (+1/-1 for the mover, landing cell or None)
+
+
+class BookEntry(NamedTuple):
+    outcome: int  # +1 / -1 for the player to move first
+    best: Optional[int]  # landing cell of the best first move, canonical coordinates
+    replies: Dict[int, Move]  # first-move landing cell -> the second player's answer
+
+
+@lru_cache(maxsize=None)
+def first_moves(size: int = 4) -> Tuple[int, ...]:
+    """Landing cells of the first move from cell 0, where canonical deals start."""
+    return tuple(sorted({end for _, end, _ in walk_table(size, CardValue.JACK.value)[0]}))
+
+
+def check_size(size: int):
+    cells = size * size
+    if 2 * cells + (cells - 1).bit_length() > 64:
+        raise ValueError(f"deal codes of a {size}x{size} board do not fit 64 bits")
+
+
+def pack_deal(key: bytes) -> int:
+    """A canonical deal key as an integer: two bits per card, then the second pawn's cell."""
+    code = 0
+    p1 = 0
+    for i, b in enumerate(key):
+        if b & PAWN_MARK:
+            p1 = i
+        code |= ((b & ~PAWN_MARK) - 1) << 2 * i
+    return code | p1 << 2 * len(key)
+
+
+def encode_move(outcome: int, best: Optional[Tuple[int, ...]]) -> int:
+    return (WIN if outcome == 1 else 0) | (best[-1] if best else NO_MOVE)
+
+
+def decode_move(byte: int) -> Move:
+    landing = byte & ~WIN
+    return (1 if byte & WIN else -1), (None if landing == NO_MOVE else landing)
+
+
+def open_default_book() -> Optional["OpeningBook"]:
+    """Open the opening book named by $COLLAPSI_BOOK, if set."""
+    path = os.environ.get("COLLAPSI_BOOK")
+    return OpeningBook(path) if path else None
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, size, flags, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} Collapsi opening book")
+        self.size = size
+        self.has_replies = bool(flags & REPLIES)
+        self._first_moves = first_moves(size)
+        self._width = 1 + (len(self._first_moves) if self.has_replies else 0)
+        self._moves_offset = HEADER_SIZE + 8 * count
+        # codes are little-endian uint64; the mapped view reads them natively
+        self._keys = memoryview(self._map)[HEADER_SIZE:self._moves_offset].cast("Q")
+
+    # ---- context manager --------------------------------------------------
+
+    def close(self):
+        self._keys.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # ---- lookups ------------------------------------------------------------
+
+    def lookup(self, key: bytes) -> Optional[BookEntry]:
+        """The book entry for a canonical deal key, or None if the book lacks the deal."""
+        if len(key) != self.size * self.size:
+            return None
+        code = pack_deal(key)
+        i = bisect_left(self._keys, code)
+        if i == len(self._keys) or self._keys[i] != code:
+            return None
+
+        offset = self._moves_offset + i * self._width
+        outcome, best = decode_move(self._map[offset])
+        replies = {}
+        if self.has_replies:
+            moves = self._map[offset + 1:offset + self._width]
+            for cell, byte in zip(self._first_moves, moves):
+                if not key[cell] & PAWN_MARK:  # the second pawn's cell is no first move
+                    replies[cell] = decode_move(byte)
+        return BookEntry(outcome, best, replies)
+
+
+# ---- building -----------------------------------------------------------------
+
+# one solver per builder process, re-initialised for every deal
+_builder = None
+
+
+def _init_builder():
+    global _builder
+    from perfect_ai_player import PerfectAIPlayer
+
+    _builder = PerfectAIPlayer(0)
+
+
+def solve_opening(solver, key: bytes, replies: bool = True) -> bytes:
+    """The move bytes of one canonical deal, solved with a PerfectAIPlayer."""
+    values, p0_idx, p1_idx, size = decode_deal(key)
+    solver._initialise_from_values(values, size, root_pawns=(p0_idx, p1_idx))
+    moves = bytearray([encode_move(*solver._solve(0, p0_idx, p1_idx, 0))])
+    if replies:
+        for cell in first_moves(size):
+            if cell == p1_idx:
+                moves.append(NO_MOVE)
+            else:
+                # the replies to losing first moves are mostly cached by the root solve
+                moves.append(encode_move(*solver._solve(1 << p0_idx, cell, p1_idx, 1)))
+    return bytes(moves)
+
+
+def sample_deal_classes(count: int, size: int = 4, seed: int = 0) -> List[bytes]:
+    """Up to *count* distinct canonical deals of seeded random deals, in the order met.
+
+    Deals are drawn as Board.setup_standard_game deals them, so a partial
+    book built from a sample covers deals about as often as games meet them,
+    and only the sample is held, not every deal class.
+    """
+    rng = random.Random(seed)
+    deck = list(standard_deck(size))
+    jack = CardValue.JACK.value
+    keys: Dict[bytes, None] = {}
+    for _ in range(SAMPLE_DRAWS * count):
+        if len(keys) >= count:
+            break
+        rng.shuffle(deck)
+        p0 = deck.index(jack)
+        keys[canonical_deal(deck, p0, deck.index(jack, p0 + 1), size)] = None
+    return list(keys)
+
+
+def _solve_chunk(task: Tuple[List[bytes], bool]) -> List[Tuple[int, bytes]]:
+    keys, replies = task
+    return [(pack_deal(key), solve_opening(_builder, key, replies)) for key in keys]
+
+
+def build_book(path: str, size: int = 4, replies: bool = True, workers: int = 1,
+               limit: Optional[int] = None, chunk_size: int = 1000, seed: int = 0):
+    """Solve the opening of every deal class of *size* and write the book to *path*.
+
+    Given *limit*, a partial book of that many deal classes sampled with
+    *seed* (sample_deal_classes) is built instead, without enumerating them
+    all.  The file is written under a temporary name and moved into place.
+    """
+    check_size(size)
+    start_time = time.time()
+    if limit is None:
+        keys = sorted(enumerate_deal_classes(size), key=pack_deal)
+    else:
+        keys = sorted(sample_deal_classes(limit, size, seed), key=pack_deal)
+    print(f"{len(keys)} deal classes to solve ({time.time() - start_time:.2f} seconds)")
+
+    tasks = [(keys[start:start + chunk_size], replies) for start in range(0, len(keys), chunk_size)]
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_builder)
+        results = pool.imap_unordered(_solve_chunk, tasks)
+    else:
+        pool = None
+        _init_builder()
+        results = map(_solve_chunk, tasks)
+
+    solved: Dict[int, bytes] = {}
+    last_report = 0.0
+    try:
+        for chunk in results:
+            solved.update(chunk)
+            now = time.time()
+            if now - last_report >= 1.0 or len(solved) == len(keys):
+                last_report = now
+                elapsed = now - start_time
+                print(f"Progress: {len(solved)}/{len(keys)} deals solved "
+                      f"({len(solved) / elapsed if elapsed else 0.0:.1f} deals/sec)...")
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    codes = sorted(solved)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size, REPLIES if replies else 0, len(codes)).ljust(HEADER_SIZE, b"\0"))
+        f.write(array("Q", codes).tobytes())
+        f.write(b"".join(solved[code] for code in codes))
+    os.replace(temp_path, path)
+    print(f"Wrote {len(codes)} deals to {path} ({os.path.getsize(path)} bytes) "
+          f"in {time.time() - start_time:.2f} seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a Collapsi opening book.")
+    parser.add_argument("path", help="book file to write")
+    parser.add_argument("--size", type=int, default=4,
+                        help="board size (default: 4)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (default: 1)")
+    parser.add_argument("--no-replies", action="store_true",
+                        help="store only the first move, not the replies to it")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="solve only N sampled deal classes, for a partial book")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the deals sampled by --limit (default: 0)")
+    args = parser.parse_args()
+    build_book(args.path, args.size, not args.no_replies, args.workers, args.limit, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Transposition caches for the Collapsi solver.
+
+A SolverCache maps solver states ``(collapsed_mask, p0_idx, p1_idx,
+player_to_move)`` to ``(value, best_path)``, where the sign of value is the
+outcome for the player to move (the distance engine stores a signed
+distance rather than ±1).  Unbounded, it is a plain dict and its get/put
+are the dict's own methods, so the search pays nothing for the wrapper.
+Given ``max_entries`` (or ``max_bytes``) it never holds more than that many
+states; when full it evicts according to its policy:
+
+``"lru"``
+    drop the least recently used state (a hit refreshes a state)
+``"fifo"``
+    drop the oldest stored state
+``"clear"``
+    drop everything and start over
+
+Evicted states are simply searched again if they are needed, so the cap
+trades time for memory and never changes a result.
+
+Hits and misses are reported by the solver through record(), once per
+search, rather than counted on every lookup.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+Key = Tuple[int, int, int, int]
+Entry = Tuple[int, Optional[Tuple[int, ...]]]
+
+POLICIES = ("lru", "fifo", "clear")
+
+# Memory per entry on 64-bit CPython, measured with tracemalloc over 4x4
+# solves: ~75 bytes in a plain dict, ~120 with the OrderedDict links (key
+# tuple, mask int, value tuple and table slot; paths are mostly shared).
+ENTRY_BYTES = 128
+
+
+class SolverCache:
+    def __init__(self, max_entries: Optional[int] = None, policy: str = "lru",
+                 max_bytes: Optional[int] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown eviction policy {policy!r}, expected one of {POLICIES}")
+        if max_bytes is not None:
+            by_bytes = max(1, max_bytes // ENTRY_BYTES)
+            max_entries = by_bytes if max_entries is None else min(max_entries, by_bytes)
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if max_entries is None:
+            self._table: Dict[Key, Entry] = {}
+            self.get = self._table.get
+            self.put = self._table.__setitem__
+        else:
+            self._table = OrderedDict()
+            if policy == "lru":
+                self.get = self._get_lru
+
+    # ---- lookups ---------------------------------------------------------
+
+    def get(self, key: Key) -> Optional[Entry]:
+        return self._table.get(key)
+
+    def _get_lru(self, key: Key) -> Optional[Entry]:
+        entry = self._table.get(key)
+        if entry is not None:
+            self._table.move_to_end(key)
+        return entry
+
+    def put(self, key: Key, entry: Entry):
+        table = self._table
+        table[key] = entry
+        if len(table) > self.max_entries:
+            if self.policy == "clear":
+                self.evictions += len(table)
+                table.clear()
+            else:
+                table.popitem(last=False)
+                self.evictions += 1
+
+    # ---- bookkeeping -----------------------------------------------------
+
+    def record(self, lookups: int, hits: int):
+        """Add one search's lookup counts to the running totals."""
+        self.hits += hits
+        self.misses += lookups - hits
+
+    def clear(self):
+        """Forget every state; the counters keep running."""
+        self._table.clear()
+
+    def reset(self):
+        """Forget every state and zero the counters."""
+        self._table.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._table
+
+    def items(self) -> Iterator[Tuple[Key, Entry]]:
+        return iter(self._table.items())
+
+    @property
+    def approx_bytes(self) -> int:
+        return len(self._table) * ENTRY_BYTES
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._table),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "approx_bytes": self.approx_bytes,
+        }
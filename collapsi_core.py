@@ -1,9 +1,12 @@
 from enum import Enum
-from typing import List, Tuple, Optional, Set
+from typing import Dict, List, Tuple, Optional, Set, Sequence
 from dataclasses import dataclass
+from functools import lru_cache
 import random
 from abc import ABC, abstractmethod
 
+from collapsi_movetable import reachable_destinations, walk_table
+
 
 class CardValue(Enum):
     JACK = 1
@@ -13,6 +16,42 @@ class CardValue(Enum):
     FOUR = 4
 
 
+CARD_VALUES = frozenset(value.value for value in CardValue)
+
+
+@lru_cache(maxsize=None)
+def standard_deck(size: int = 4) -> Tuple[int, ...]:
+    """Card values of the standard deck for a size x size board.
+
+    On 4x4 this is the published deck: two Jacks, four each of A, 2 and 3,
+    and two 4s (Jacks and Aces both move 1).  Other sizes keep the two Jacks
+    and share the remaining cards out in the same 4:4:4:2 proportions, by
+    largest remainder with ties going to the lower value: 5x5 gets 7/7/6/3
+    and 6x6 10/10/9/5.
+    """
+    cards = size * size - 2
+    weights = {1: 4, 2: 4, 3: 4, 4: 2}
+    total = sum(weights.values())
+    counts = {value: cards * weight // total for value, weight in weights.items()}
+    by_remainder = sorted(weights, key=lambda value: (-(cards * weights[value] % total), value))
+    for value in by_remainder[:cards - sum(counts.values())]:
+        counts[value] += 1
+    counts[1] += 2  # the Jacks
+    return tuple(value for value, count in counts.items() for _ in range(count))
+
+
+def check_deck(deck: Sequence[int], size: int) -> Tuple[int, ...]:
+    """Validate a deck given as card values for a size x size board."""
+    deck = tuple(deck)
+    if len(deck) != size * size:
+        raise ValueError(f"a {size}x{size} board needs {size * size} cards, got {len(deck)}")
+    if not CARD_VALUES.issuperset(deck):
+        raise ValueError(f"card values must be among {sorted(CARD_VALUES)}")
+    if deck.count(CardValue.JACK.value) < 2:
+        raise ValueError("a deck needs at least two 1-cards for the pawns to start on")
+    return deck
+
+
 @dataclass
 class Card:
     value: CardValue
@@ -43,15 +82,24 @@ class Position:
 
 
 class Board:
-    def __init__(self, size: int = 4):
+    def __init__(self, size: int = 4, deck: Optional[Sequence[int]] = None):
+        """*deck* lists the card values to deal; standard_deck(size) by default."""
         self.size = size
+        self.deck = standard_deck(size) if deck is None else check_deck(deck, size)
         self.grid: List[List[Optional[Card]]] = [[None for _ in range(size)] for _ in range(size)]
         self.player_positions = {0: None, 1: None}
         
-    def setup_standard_game(self):
-        deck = self._create_standard_deck()
-        random.shuffle(deck)
-        
+    def setup_standard_game(self, rng: Optional[random.Random] = None):
+        deck = self._create_deck()
+        (rng or random).shuffle(deck)
+        self._deal(deck)
+    
+    def setup_from_values(self, values: Sequence[int]):
+        """Lay out cards with the given values in row-major order, placing pawns as a normal deal would."""
+        deck = [Card(CardValue(value)) for value in reversed(values)]
+        self._deal(deck)
+    
+    def _deal(self, deck: List[Card]):
         jack_count = 0
         for i in range(self.size):
             for j in range(self.size):
@@ -62,14 +110,16 @@ class Board:
                     self.player_positions[jack_count] = Position(i, j)
                     jack_count += 1
     
-    def _create_standard_deck(self) -> List[Card]:
-        deck = []
-        deck.extend([Card(CardValue.JACK) for _ in range(2)])
-        deck.extend([Card(CardValue.ACE) for _ in range(4)])
-        deck.extend([Card(CardValue.TWO) for _ in range(4)])
-        deck.extend([Card(CardValue.THREE) for _ in range(4)])
-        deck.extend([Card(CardValue.FOUR) for _ in range(2)])
-        return deck
+    def _create_deck(self) -> List[Card]:
+        return [Card(CardValue(value)) for value in self.deck]
+    
+    def clone(self) -> "Board":
+        """Independent copy; only the collapse flags need fresh Card objects."""
+        board = Board(self.size)
+        board.deck = self.deck
+        board.grid = [[Card(card.value, card.is_collapsed) for card in row] for row in self.grid]
+        board.player_positions = dict(self.player_positions)
+        return board
     
     def get_card(self, pos: Position) -> Optional[Card]:
         return self.grid[pos.row][pos.col]
@@ -84,42 +134,59 @@ class Board:
     
     def wrap_position(self, pos: Position) -> Position:
         return Position(pos.row % self.size, pos.col % self.size)
+    
+    def collapsed_mask(self) -> int:
+        """Bit row*size+col is set for every collapsed card."""
+        mask = 0
+        bit = 1
+        for row in self.grid:
+            for card in row:
+                if card.is_collapsed:
+                    mask |= bit
+                bit <<= 1
+        return mask
+
+
+@lru_cache(maxsize=None)
+def _cell_positions(size: int) -> Tuple[Position, ...]:
+    return tuple(Position(i // size, i % size) for i in range(size * size))
 
 
 class MoveValidator:
     @staticmethod
     def get_possible_moves(board: Board, start_pos: Position, steps: int, 
                           current_player: int) -> List[List[Position]]:
-        all_paths = []
-        visited = set()
-        current_path = []
-        
-        def dfs(pos: Position, remaining_steps: int):
-            if remaining_steps == 0:
-                if pos != start_pos and not board.get_card(pos).is_collapsed:
-                    opponent_pos = board.player_positions[1 - current_player]
-                    if opponent_pos != pos:
-                        all_paths.append(current_path[:])
-                return
-            
-            directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-            
-            for dr, dc in directions:
-                new_pos = Position(pos.row + dr, pos.col + dc)
-                new_pos = board.wrap_position(new_pos)
-                
-                if new_pos not in visited:
-                    card = board.get_card(new_pos)
-                    if card and not card.is_collapsed:
-                        visited.add(new_pos)
-                        current_path.append(new_pos)
-                        dfs(new_pos, remaining_steps - 1)
-                        current_path.pop()
-                        visited.remove(new_pos)
-        
-        visited.add(start_pos)
-        dfs(start_pos, steps)
-        return all_paths
+        size = board.size
+        collapsed = board.collapsed_mask()
+        opponent_pos = board.player_positions[1 - current_player]
+        opponent = opponent_pos.row * size + opponent_pos.col if opponent_pos else -1
+        positions = _cell_positions(size)
+        
+        return [
+            [positions[i] for i in path]
+            for walk_mask, end, path in walk_table(size, steps)[start_pos.row * size + start_pos.col]
+            if not walk_mask & collapsed and end != opponent
+        ]
+    
+    @staticmethod
+    def get_reachable_destinations(board: Board, start_pos: Position, steps: int,
+                                   current_player: int) -> Dict[Position, List[Position]]:
+        """Map every cell the player can land on to one path reaching it.
+
+        The resulting position depends only on where the pawn lands, so this
+        is all a search needs; the path is the first one get_possible_moves
+        would list for that cell.
+        """
+        size = board.size
+        opponent_pos = board.player_positions[1 - current_player]
+        opponent = opponent_pos.row * size + opponent_pos.col if opponent_pos else -1
+        positions = _cell_positions(size)
+        walks = walk_table(size, steps)[start_pos.row * size + start_pos.col]
+        
+        return {
+            positions[end]: [positions[i] for i in path]
+            for _, end, path in reachable_destinations(walks, board.collapsed_mask(), opponent)
+        }
     
     @staticmethod
     def is_valid_move(board: Board, start_pos: Position, path: List[Position], 
@@ -170,17 +237,34 @@ class GameState(Enum):
 
 
 class Game:
-    def __init__(self, board_size: int = 4):
-        self.board = Board(board_size)
+    def __init__(self, board_size: int = 4, deck: Optional[Sequence[int]] = None):
+        self.board = Board(board_size, deck)
         self.current_player = 0
         self.state = GameState.NOT_STARTED
         self.winner = None
         self.move_history = []
+        # legal moves of the current position, filled on first use and
+        # dropped whenever the position changes
+        self._valid_moves: Optional[List[List[Position]]] = None
+        self._destinations: Optional[Dict[Position, List[Position]]] = None
+        
+    def start_game(self, rng: Optional[random.Random] = None):
+        self.board.setup_standard_game(rng)
+        self.state = GameState.IN_PROGRESS
+        self.current_player = 0
+        self.invalidate_moves()
         
-    def start_game(self):
-        self.board.setup_standard_game()
+    def start_from_values(self, values: Sequence[int]):
+        """Start a game on a known deal, given as row-major card values."""
+        self.board.setup_from_values(values)
         self.state = GameState.IN_PROGRESS
         self.current_player = 0
+        self.invalidate_moves()
+        
+    def invalidate_moves(self):
+        """Forget the cached legal moves; needed after editing the board or players directly."""
+        self._valid_moves = None
+        self._destinations = None
         
     def get_current_player_position(self) -> Position:
         return self.board.player_positions[self.current_player]
@@ -191,14 +275,29 @@ class Game:
         return card.value.value if card else 0
     
     def get_valid_moves(self) -> List[List[Position]]:
-        pos = self.get_current_player_position()
-        steps = self.get_required_steps()
-        return MoveValidator.get_possible_moves(self.board, pos, steps, self.current_player)
+        """Every legal path for the player to move; cached, so do not modify the result."""
+        if self._valid_moves is None:
+            pos = self.get_current_player_position()
+            steps = self.get_required_steps()
+            self._valid_moves = MoveValidator.get_possible_moves(self.board, pos, steps,
+                                                                 self.current_player)
+        return self._valid_moves
+    
+    def get_reachable_destinations(self) -> Dict[Position, List[Position]]:
+        """Cached like get_valid_moves."""
+        if self._destinations is None:
+            pos = self.get_current_player_position()
+            steps = self.get_required_steps()
+            self._destinations = MoveValidator.get_reachable_destinations(self.board, pos, steps,
+                                                                          self.current_player)
+        return self._destinations
     
     def make_move(self, path: List[Position]) -> bool:
         start_pos = self.get_current_player_position()
         
-        if not MoveValidator.is_valid_move(self.board, start_pos, path, self.current_player):
+        # legal iff it is one of the cached legal paths (a list equality
+        # scan beats hashing a set of Position tuples for a handful of moves)
+        if list(path) not in self.get_valid_moves():
             return False
         
         self.board.collapse_card(start_pos)
@@ -214,6 +313,7 @@ class Game:
         })
         
         self.current_player = 1 - self.current_player
+        self.invalidate_moves()
         
         if not self.get_valid_moves():
             self.state = GameState.FINISHED
@@ -221,5 +321,32 @@ class Game:
             
         return True
     
+    def undo_move(self) -> Optional[List[Position]]:
+        """Take back the last move; return its path, or None if there is none."""
+        if not self.move_history:
+            return None
+        last = self.move_history.pop()
+        
+        # the card a pawn leaves was live, since the pawn stood on it
+        self.board.get_card(last['from']).is_collapsed = False
+        self.board.player_positions[last['player']] = last['from']
+        self.current_player = last['player']
+        self.state = GameState.IN_PROGRESS
+        self.winner = None
+        self.invalidate_moves()
+        return last['path']
+    
+    def clone(self) -> "Game":
+        """Copy for lookahead; the history entries and cached moves are shared, never mutated."""
+        game = Game.__new__(Game)
+        game.board = self.board.clone()
+        game.current_player = self.current_player
+        game.state = self.state
+        game.winner = self.winner
+        game.move_history = self.move_history[:]
+        game._valid_moves = self._valid_moves
+        game._destinations = self._destinations
+        return game
+    
     def is_game_over(self) -> bool:
         return self.state == GameState.FINISHED
\ No newline at end of file
@@ -1,13 +1,71 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 from typing import List, Optional, Tuple
+import os
+import queue
 import threading
 import time
 
 from collapsi_core import Game, Position, GameState, CardValue
 from player_interface import Player, HumanPlayer, RandomAIPlayer
 from example_ai_player import GreedyAIPlayer, DefensiveAIPlayer
-from perfect_ai_player import PerfectAIPlayer
+from perfect_ai_player import PerfectAIPlayer, SearchCancelled, SolverService
+from mcts_ai_player import MCTSPlayer
+from collapsi_book import open_default_book
+from collapsi_tablebase import open_default_tablebase
+
+# how often a pending AI move is polled and its progress redrawn (~60 fps)
+AI_POLL_MS = 16
+# largest board the Perfect AI can solve in reasonable time; 6x6 deals never finish
+PERFECT_AI_MAX_SIZE = 5
+
+
+class AIMoveSearch:
+    """One AI get_move call running on a daemon worker thread.
+
+    Tk may only be touched from the main thread, so the worker just leaves
+    its move in a queue for the GUI to poll.
+    """
+
+    def __init__(self, player: Player, game: Game, valid_moves: List[List[Position]]):
+        self.player = player
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.moves: queue.Queue = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._run, args=(game, valid_moves), daemon=True)
+        self.thread.start()
+
+    def _run(self, game: Game, valid_moves: List[List[Position]]):
+        try:
+            move = self.player.get_move(game, valid_moves)
+        except SearchCancelled:
+            return
+        self.finished = time.time()
+        self.moves.put(move)
+
+    def cancel(self):
+        self.player.cancel_move()
+
+    def progress(self) -> str:
+        elapsed = time.time() - self.started
+        nodes = self.player.search_stats().get("nodes")
+        if nodes is None:
+            return f"{self.player.name} is thinking... {elapsed:.1f} s"
+        return f"{self.player.name} is thinking... {nodes:,} nodes, {elapsed:.1f} s"
+
+    def summary(self) -> str:
+        """One line on the finished search, or "" for players that keep no stats."""
+        stats = self.player.search_stats()
+        if not stats:
+            return ""
+        if "last_solve" in stats:  # profiled solver
+            return f"{self.player.name}: {stats['last_solve']}"
+        text = f"{self.player.name}: {(self.finished - self.started) * 1000:.0f} ms"
+        if "hit_rate" in stats:  # the solver's counters run across the whole deal
+            return text + f", {stats['nodes']:,} nodes and {stats['hit_rate']*100:.0f}% cache hits this deal"
+        if "nodes" in stats:
+            return text + f", {stats['nodes']:,} nodes"
+        return text
 
 
 class CollapsiGUI:
@@ -17,11 +75,31 @@ class CollapsiGUI:
         self.master.configure(bg='#2b2b2b')
         
         self.game = Game()
+        self.board_size = 4
         self.players = [None, None]
         self.current_valid_moves = []
+        self.current_destinations = {}
         self.selected_path = []
         self.hovering_path = []
         self.animating = False
+        self.ai_search: Optional[AIMoveSearch] = None
+        # retained canvas items, made by build_board, and what they last showed
+        self.cell_items = {}
+        self.cell_states = {}
+        self.pawn_items = {}
+        self.pawn_cells = {}
+        self.pending_motion = None
+        # solved deals persist across sessions when $COLLAPSI_TABLEBASE is set
+        self.tablebase = open_default_tablebase()
+        # and first moves are instant when $COLLAPSI_BOOK names an opening book
+        self.book = open_default_book()
+        # Perfect AIs on both seats share one solver per deal; its search
+        # counters are shown under the board after each AI move, with the
+        # full per-solve profile (about 30% slower) when $COLLAPSI_PROFILE is set
+        self.solver_service = SolverService(tablebase=self.tablebase, book=self.book,
+                                            profile=bool(os.environ.get("COLLAPSI_PROFILE")))
+        self.last_search = ""
+        self.game_ended = True
         
         self.cell_size = 80
         self.board_margin = 20
@@ -40,6 +118,11 @@ class CollapsiGUI:
         }
         
         self.setup_ui()
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+    def on_close(self):
+        self.cancel_ai_move()
+        self.master.destroy()
         
     def setup_ui(self):
         main_frame = tk.Frame(self.master, bg=self.colors['bg'])
@@ -68,7 +151,7 @@ class CollapsiGUI:
         )
         self.status_label.pack(side=tk.LEFT, padx=20)
         
-        canvas_size = self.cell_size * 4 + self.board_margin * 2
+        canvas_size = self.cell_size * self.board_size + self.board_margin * 2
         self.canvas = tk.Canvas(
             main_frame,
             width=canvas_size,
@@ -98,7 +181,7 @@ class CollapsiGUI:
         dialog = tk.Toplevel(self.master)
         dialog.title("New Game Setup")
         dialog.configure(bg=self.colors['bg'])
-        dialog.geometry("400x300")
+        dialog.geometry("400x380")
         
         tk.Label(
             dialog,
@@ -110,6 +193,8 @@ class CollapsiGUI:
         
         player_frames = []
         player_vars = []
+        player_boxes = []
+        player_types = ["Human", "Random AI", "Greedy AI", "Defensive AI", "Perfect AI", "MCTS AI"]
         
         for i in range(2):
             frame = tk.Frame(dialog, bg=self.colors['bg'])
@@ -126,22 +211,70 @@ class CollapsiGUI:
             var = tk.StringVar(value="Human")
             player_vars.append(var)
             
-            ttk.Combobox(
+            box = ttk.Combobox(
                 frame,
                 textvariable=var,
-                values=["Human", "Random AI", "Greedy AI", "Defensive AI", "Perfect AI"],
+                values=player_types,
                 state="readonly",
                 width=15
-            ).pack(side=tk.LEFT)
+            )
+            box.pack(side=tk.LEFT)
+            player_boxes.append(box)
             
             player_frames.append(frame)
         
+        size_frame = tk.Frame(dialog, bg=self.colors['bg'])
+        size_frame.pack(pady=10)
+        tk.Label(
+            size_frame,
+            text="Board:",
+            bg=self.colors['bg'],
+            fg='white',
+            font=('Arial', 12)
+        ).pack(side=tk.LEFT, padx=5)
+        size_var = tk.StringVar(value=f"{self.board_size}x{self.board_size}")
+        ttk.Combobox(
+            size_frame,
+            textvariable=size_var,
+            values=["4x4", "5x5", "6x6"],
+            state="readonly",
+            width=15
+        ).pack(side=tk.LEFT)
+        
+        size_note = tk.Label(
+            dialog,
+            text="",
+            bg=self.colors['bg'],
+            fg='white',
+            font=('Arial', 10)
+        )
+        size_note.pack()
+        
+        def on_size_change(*_):
+            # the Perfect AI cannot finish a 6x6 deal, so it is not offered there
+            size = int(size_var.get().split("x")[0])
+            allowed = player_types if size <= PERFECT_AI_MAX_SIZE else \
+                [name for name in player_types if name != "Perfect AI"]
+            for box, var in zip(player_boxes, player_vars):
+                box.config(values=allowed)
+                if var.get() not in allowed:
+                    var.set("MCTS AI")
+            size_note.config(text="" if size <= PERFECT_AI_MAX_SIZE else
+                             f"Perfect AI is only offered up to {PERFECT_AI_MAX_SIZE}x{PERFECT_AI_MAX_SIZE}: "
+                             f"it cannot finish larger deals")
+        
+        size_var.trace_add("write", on_size_change)
+        on_size_change()
+        
         button_frame = tk.Frame(dialog, bg=self.colors['bg'])
         button_frame.pack(pady=20)
         
         def start_game():
+            self.cancel_ai_move()
+            self.end_game_for_players()
             self.players[0] = self.create_player(0, player_vars[0].get())
             self.players[1] = self.create_player(1, player_vars[1].get())
+            self.board_size = int(size_var.get().split("x")[0])
             dialog.destroy()
             self.start_new_game()
         
@@ -179,16 +312,40 @@ class CollapsiGUI:
         elif player_type == "Defensive AI":
             return DefensiveAIPlayer(player_id)
         elif player_type == "Perfect AI":
-            return PerfectAIPlayer(player_id)
+            return PerfectAIPlayer(player_id, service=self.solver_service)
+        elif player_type == "MCTS AI":
+            return MCTSPlayer(player_id)
         
     def start_new_game(self):
-        self.game = Game()
+        self.cancel_ai_move()
+        self.game = Game(self.board_size)
         self.game.start_game()
         self.current_valid_moves = []
+        self.current_destinations = {}
         self.selected_path = []
+        self.hovering_path = []
+        self.animating = False
+        self.last_search = ""
+        self.game_ended = False
+        for player in self.players:
+            player.on_game_start(self.game)
+        self.build_board()
         self.update_display()
         self.play_turn()
         
+    def end_game_for_players(self):
+        """Tell the players the current game is over, once, even if it was abandoned.
+
+        A search still running is cancelled first: once a player has released
+        its deal, cancel_move would no longer reach the solver.
+        """
+        self.cancel_ai_move()
+        if self.game_ended:
+            return
+        self.game_ended = True
+        for player in self.players:
+            player.on_game_end(self.game, self.game.winner)
+        
     def play_turn(self):
         if self.game.is_game_over():
             self.show_game_over()
@@ -196,6 +353,7 @@ class CollapsiGUI:
             
         current_player = self.players[self.game.current_player]
         self.current_valid_moves = self.game.get_valid_moves()
+        self.current_destinations = self.game.get_reachable_destinations()
         
         if not self.current_valid_moves:
             self.game.state = GameState.FINISHED
@@ -208,20 +366,48 @@ class CollapsiGUI:
         if isinstance(current_player, HumanPlayer):
             self.highlight_valid_moves()
         else:
-            self.master.after(500, self.ai_make_move)
+            self.master.after(500, self.ai_make_move, self.game)
             
-    def ai_make_move(self):
-        if self.animating:
+    def ai_make_move(self, game: Game):
+        # scheduled by play_turn; a new game may have started in the meantime
+        if game is not self.game or self.animating or self.ai_search is not None:
             return
             
         current_player = self.players[self.game.current_player]
-        move = current_player.get_move(self.game, self.current_valid_moves)
+        if isinstance(current_player, HumanPlayer):
+            return
+        search = AIMoveSearch(current_player, self.game, self.current_valid_moves)
+        self.ai_search = search
+        self.poll_ai_move(search)
         
+    def poll_ai_move(self, search: AIMoveSearch):
+        if search is not self.ai_search:
+            return  # cancelled
+            
+        try:
+            move = search.moves.get_nowait()
+        except queue.Empty:
+            self.status_label.config(text=search.progress())
+            self.master.after(AI_POLL_MS, self.poll_ai_move, search)
+            return
+        
+        self.ai_search = None
+        summary = search.summary()
+        if summary:
+            self.last_search = summary
+        self.update_status()
         if move:
             self.animate_move(move)
             
+    def cancel_ai_move(self):
+        """Abandon the AI move being computed, if any; its result is never used."""
+        if self.ai_search is not None:
+            self.ai_search.cancel()
+            self.ai_search = None
+            
     def on_human_turn(self, valid_moves: List[List[Position]]):
         self.current_valid_moves = valid_moves
+        self.current_destinations = self.game.get_reachable_destinations()
         self.highlight_valid_moves()
         
     def on_click(self, event):
@@ -238,15 +424,24 @@ class CollapsiGUI:
         x = (event.x - self.board_margin) // self.cell_size
         y = (event.y - self.board_margin) // self.cell_size
         
-        if 0 <= x < 4 and 0 <= y < 4:
+        if 0 <= x < self.game.board.size and 0 <= y < self.game.board.size:
             clicked_pos = Position(y, x)
             
-            for move in self.current_valid_moves:
-                if move[-1] == clicked_pos:
-                    self.animate_move(move)
-                    return
+            move = self.current_destinations.get(clicked_pos)
+            if move:
+                self.animate_move(move)
                     
     def on_mouse_move(self, event):
+        # a burst of motion events costs one redraw: keep the latest and
+        # handle it on the next idle
+        pending = self.pending_motion is not None
+        self.pending_motion = event
+        if not pending:
+            self.master.after_idle(self.process_mouse_move)
+            
+    def process_mouse_move(self):
+        event = self.pending_motion
+        self.pending_motion = None
         if self.animating or self.game.state != GameState.IN_PROGRESS:
             return
             
@@ -257,15 +452,15 @@ class CollapsiGUI:
         x = (event.x - self.board_margin) // self.cell_size
         y = (event.y - self.board_margin) // self.cell_size
         
-        if 0 <= x < 4 and 0 <= y < 4:
+        if 0 <= x < self.game.board.size and 0 <= y < self.game.board.size:
             hover_pos = Position(y, x)
             
-            for move in self.current_valid_moves:
-                if move[-1] == hover_pos:
-                    if self.hovering_path != move:
-                        self.hovering_path = move
-                        self.update_display()
-                    return
+            move = self.current_destinations.get(hover_pos)
+            if move:
+                if self.hovering_path != move:
+                    self.hovering_path = move
+                    self.update_display()
+                return
                     
         if self.hovering_path:
             self.hovering_path = []
@@ -273,95 +468,129 @@ class CollapsiGUI:
             
     def animate_move(self, move: List[Position]):
         self.animating = True
-        
-        def animate():
-            for i, pos in enumerate(move):
-                self.selected_path = move[:i+1]
-                self.update_display()
-                time.sleep(0.2)
-                
-            self.game.make_move(move)
-            self.selected_path = []
-            self.hovering_path = []
-            self.animating = False
-            
-            self.master.after(100, self.after_move)
+        self.animate_step(self.game, move, 1)
+        
+    def animate_step(self, game: Game, move: List[Position], shown: int):
+        # runs on the Tk thread; each step is scheduled with after()
+        if game is not self.game:
+            return  # a new game was started mid-animation
+        if shown <= len(move):
+            self.selected_path = move[:shown]
+            self.update_display()
+            self.master.after(200, self.animate_step, game, move, shown + 1)
+            return
             
-        thread = threading.Thread(target=animate)
-        thread.daemon = True
-        thread.start()
+        self.game.make_move(move)
+        self.selected_path = []
+        self.hovering_path = []
+        self.animating = False
         
-    def after_move(self):
+        self.master.after(100, self.after_move, game)
+        
+    def after_move(self, game: Game):
+        if game is not self.game:
+            return  # a new game was started since the move
         self.update_display()
         self.play_turn()
         
     def highlight_valid_moves(self):
         self.update_display()
         
-    def update_display(self):
+    def build_board(self):
+        """Create the canvas items for a new game; update_display only reconfigures them."""
         self.canvas.delete("all")
-        
-        for row in range(4):
-            for col in range(4):
+        size = self.game.board.size
+        canvas_size = self.cell_size * size + self.board_margin * 2
+        self.canvas.config(width=canvas_size, height=canvas_size)
+        self.cell_items = {}
+        self.cell_states = {}
+        self.pawn_items = {}
+        self.pawn_cells = {}
+        
+        for row in range(size):
+            for col in range(size):
                 x = col * self.cell_size + self.board_margin
                 y = row * self.cell_size + self.board_margin
                 
-                pos = Position(row, col)
-                card = self.game.board.get_card(pos)
-                
-                if card.is_collapsed:
-                    color = self.colors['collapsed']
-                else:
-                    color = self.colors['card_bg']
-                    
-                is_valid_end = any(move[-1] == pos for move in self.current_valid_moves)
-                if is_valid_end and isinstance(self.players[self.game.current_player], HumanPlayer):
-                    color = self.colors['valid_move']
-                    
-                if pos in self.selected_path:
-                    color = self.colors['path']
-                elif pos in self.hovering_path:
-                    color = self.colors['hover']
-                
-                self.canvas.create_rectangle(
+                rect = self.canvas.create_rectangle(
                     x + 2, y + 2,
                     x + self.cell_size - 2, y + self.cell_size - 2,
-                    fill=color,
+                    fill=self.colors['card_bg'],
                     outline='#666666',
                     width=2
                 )
+                text = self.canvas.create_text(
+                    x + self.cell_size // 2,
+                    y + self.cell_size // 2,
+                    text="",
+                    font=('Arial', 24, 'bold'),
+                    fill=self.colors['text']
+                )
+                self.cell_items[Position(row, col)] = (rect, text)
+        
+        # created last so the pieces stay above the cards
+        for player_id in (0, 1):
+            player_color = self.colors['player1'] if player_id == 0 else self.colors['player2']
+            oval = self.canvas.create_oval(0, 0, 0, 0, fill=player_color, outline='white', width=2)
+            label = self.canvas.create_text(
+                0, 0,
+                text=f"P{player_id + 1}",
+                font=('Arial', 10, 'bold'),
+                fill='white'
+            )
+            self.pawn_items[player_id] = (oval, label)
+        
+    def update_display(self):
+        """Reconfigure only the cells and pieces whose appearance changed."""
+        human_turn = isinstance(self.players[self.game.current_player], HumanPlayer)
+        selected = set(self.selected_path)
+        hovering = set(self.hovering_path)
+        
+        for pos, (rect, text) in self.cell_items.items():
+            card = self.game.board.get_card(pos)
+            
+            if card.is_collapsed:
+                color = self.colors['collapsed']
+            else:
+                color = self.colors['card_bg']
                 
-                if not card.is_collapsed:
-                    self.canvas.create_text(
-                        x + self.cell_size // 2,
-                        y + self.cell_size // 2,
-                        text=str(card),
-                        font=('Arial', 24, 'bold'),
-                        fill=self.colors['text']
-                    )
+            if human_turn and pos in self.current_destinations:
+                color = self.colors['valid_move']
                 
-                for player_id, player_pos in self.game.board.player_positions.items():
-                    if player_pos == pos:
-                        player_color = self.colors['player1'] if player_id == 0 else self.colors['player2']
-                        # Draw smaller player piece in the corner
-                        piece_size = 25
-                        offset = 5
-                        self.canvas.create_oval(
-                            x + self.cell_size - piece_size - offset,
-                            y + offset,
-                            x + self.cell_size - offset,
-                            y + piece_size + offset,
-                            fill=player_color,
-                            outline='white',
-                            width=2
-                        )
-                        self.canvas.create_text(
-                            x + self.cell_size - piece_size//2 - offset,
-                            y + piece_size//2 + offset,
-                            text=f"P{player_id + 1}",
-                            font=('Arial', 10, 'bold'),
-                            fill='white'
-                        )
+            if pos in selected:
+                color = self.colors['path']
+            elif pos in hovering:
+                color = self.colors['hover']
+            
+            state = (color, "" if card.is_collapsed else str(card))
+            if self.cell_states.get(pos) != state:
+                self.cell_states[pos] = state
+                self.canvas.itemconfigure(rect, fill=state[0])
+                self.canvas.itemconfigure(text, text=state[1])
+        
+        # Draw smaller player piece in the corner
+        piece_size = 25
+        offset = 5
+        for player_id, player_pos in self.game.board.player_positions.items():
+            cell = (player_pos.row, player_pos.col)
+            if self.pawn_cells.get(player_id) == cell:
+                continue
+            self.pawn_cells[player_id] = cell
+            x = player_pos.col * self.cell_size + self.board_margin
+            y = player_pos.row * self.cell_size + self.board_margin
+            oval, label = self.pawn_items[player_id]
+            self.canvas.coords(
+                oval,
+                x + self.cell_size - piece_size - offset,
+                y + offset,
+                x + self.cell_size - offset,
+                y + piece_size + offset
+            )
+            self.canvas.coords(
+                label,
+                x + self.cell_size - piece_size//2 - offset,
+                y + piece_size//2 + offset
+            )
                         
     def update_status(self):
         if self.game.state == GameState.IN_PROGRESS:
@@ -375,11 +604,13 @@ class CollapsiGUI:
             card = self.game.board.get_card(pos)
             valid_count = len(self.current_valid_moves)
             
-            self.info_label.config(
-                text=f"Current card: {card} | Valid moves: {valid_count}"
-            )
+            info = f"Current card: {card} | Valid moves: {valid_count}"
+            if self.last_search:
+                info += f"\nLast search: {self.last_search}"
+            self.info_label.config(text=info)
             
     def show_game_over(self):
+        self.end_game_for_players()
         winner = self.players[self.game.winner]
         self.status_label.config(text=f"Game Over! {winner.name} wins!")
         
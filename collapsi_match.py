@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Headless Collapsi matches and round-robin tournaments between AI players.
+
+Every pairing plays the same seeded deals, each deal twice with the seats
+swapped, so neither player profits from the first-player advantage.  Games
+are spread over a process pool; each worker keeps one SolverService, so
+Perfect AIs on both seats of a game solve the deal once.
+
+Variants are played with --size and --deck.  A cold Perfect AI solve takes
+seconds on 5x5 and is out of reach on 6x6, where MCTS is the strong player.
+
+--record PATH saves every game played in the compact binary format of
+collapsi_records.
+"""
+
+from collapsi_core import Game, GameState, check_deck
+from collapsi_records import GameRecord, GameRecordWriter, encode_record
+from example_ai_player import DefensiveAIPlayer, GreedyAIPlayer
+from mcts_ai_player import MCTSPlayer
+from perfect_ai_player import PerfectAIPlayer, SolverService
+from player_interface import Player, RandomAIPlayer
+from itertools import combinations
+from math import sqrt
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import argparse
+import multiprocessing
+import random
+import time
+
+
+# MCTS gets a playout rather than a time budget, so results do not depend on the machine
+MCTS_PLAYOUTS = 2000
+
+PLAYER_TYPES: Dict[str, Callable[[int, SolverService], Player]] = {
+    "random": lambda player_id, service: RandomAIPlayer(player_id, f"Random AI {player_id + 1}"),
+    "greedy": lambda player_id, service: GreedyAIPlayer(player_id),
+    "defensive": lambda player_id, service: DefensiveAIPlayer(player_id),
+    "perfect": lambda player_id, service: PerfectAIPlayer(player_id, service=service),
+    "mcts": lambda player_id, service: MCTSPlayer(player_id, time_budget=None, playouts=MCTS_PLAYOUTS,
+                                                  seed=random.getrandbits(32)),
+}
+
+# one service per process, shared by every Perfect AI it creates
+_worker_service: Optional[SolverService] = None
+
+
+def _init_worker():
+    global _worker_service
+    _worker_service = SolverService()
+
+
+def play_game(players: List[Player], game: Game) -> Tuple[int, List[float], List[int]]:
+    """Play a started game to the end; return (winner, seconds per seat, moves per seat).
+
+    A player that returns no move or an illegal one loses on the spot.
+    """
+    for player in players:
+        player.on_game_start(game)
+    think_time = [0.0, 0.0]
+    moves = [0, 0]
+
+    while not game.is_game_over():
+        seat = game.current_player
+        valid_moves = game.get_valid_moves()
+        if not valid_moves:
+            game.state = GameState.FINISHED
+            game.winner = 1 - seat
+            break
+        start_time = time.perf_counter()
+        move = players[seat].get_move(game, valid_moves)
+        think_time[seat] += time.perf_counter() - start_time
+        moves[seat] += 1
+        if not move or not game.make_move(move):
+            game.state = GameState.FINISHED
+            game.winner = 1 - seat
+
+    for player in players:
+        player.on_game_end(game, game.winner)
+    return game.winner, think_time, moves
+
+
+def _play_games(task: Tuple[int, str, str, int, int, int, Optional[Tuple[int, ...]], bool]
+                ) -> Tuple[int, int, float, int, float, int, List[bytes]]:
+    """Play games [start, stop) of one pairing.
+
+    Game i uses deal i // 2; on odd games the second entrant moves first.
+    Returns (games, wins of the first entrant, its seconds and moves, the
+    second entrant's seconds and moves, the encoded games if recording).
+    """
+    seed, name_a, name_b, start, stop, size, deck, record = task
+    wins_a = moves_a = moves_b = 0
+    time_a = time_b = 0.0
+    records = []
+    for game_idx in range(start, stop):
+        deal_idx = game_idx // 2
+        swapped = game_idx % 2
+        # RandomAIPlayer draws from the module-level generator, MCTSPlayer is seeded from it
+        random.seed(f"{seed}:{name_a}:{name_b}:{game_idx}")
+        seats = (name_b, name_a) if swapped else (name_a, name_b)
+        players = [PLAYER_TYPES[name](player_id, _worker_service) for player_id, name in enumerate(seats)]
+
+        game = Game(size, deck)
+        game.start_game(random.Random(f"{seed}:{deal_idx}"))
+        winner, think_time, moves = play_game(players, game)
+        if record:
+            records.append(encode_record(GameRecord.from_game(game)))
+
+        seat_a = 1 if swapped else 0
+        wins_a += winner == seat_a
+        time_a += think_time[seat_a]
+        moves_a += moves[seat_a]
+        time_b += think_time[1 - seat_a]
+        moves_b += moves[1 - seat_a]
+    return stop - start, wins_a, time_a, moves_a, time_b, moves_b, records
+
+
+def wilson_interval(wins: int, games: int, z: float = 1.96) -> Tuple[float, float]:
+    """Wilson score interval for a win rate (95% by default)."""
+    if not games:
+        return 0.0, 1.0
+    p = wins / games
+    denominator = 1 + z * z / games
+    centre = (p + z * z / (2 * games)) / denominator
+    half_width = z * sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+def run_tournament(names: List[str], games=100, workers=1, seed=None, size=4,
+                   deck: Optional[Sequence[int]] = None, record_path: Optional[str] = None):
+    """Round-robin between the named player types, *games* games per pairing.
+
+    Games are played on a size x size board dealt from *deck* (card values),
+    by default the standard deck for that size.  With *record_path* every
+    game is also written there as a game record file, in task order.
+    """
+
+    print("Collapsi Round-Robin Tournament")
+    print("=" * 50)
+
+    if seed is None:
+        seed = random.randrange(2**32)
+    pairings = list(combinations(range(len(names)), 2))
+    print(f"{len(names)} players, {len(pairings)} pairings, {games} games each "
+          f"on {size}x{size} (seed {seed}, {workers} worker(s))\n")
+
+    chunk_size = max(2, min(50, games // (workers * 4)) // 2 * 2)
+    tasks = []
+    task_pairings = []
+    for a, b in pairings:
+        for start in range(0, games, chunk_size):
+            tasks.append((seed, names[a], names[b], start, min(start + chunk_size, games), size,
+                          tuple(deck) if deck is not None else None, record_path is not None))
+            task_pairings.append((a, b))
+
+    start_time = time.time()
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker)
+        results = pool.map(_play_games, tasks)
+        pool.close()
+        pool.join()
+    else:
+        _init_worker()
+        results = list(map(_play_games, tasks))
+    elapsed = time.time() - start_time
+
+    # per pairing: [games, wins of a]; per entrant: [games, wins, seconds, moves]
+    pairing_totals = {pairing: [0, 0] for pairing in pairings}
+    entrant_totals = [[0, 0, 0.0, 0] for _ in names]
+    for (a, b), (n, wins_a, time_a, moves_a, time_b, moves_b, _) in zip(task_pairings, results):
+        pairing_totals[(a, b)][0] += n
+        pairing_totals[(a, b)][1] += wins_a
+        for entrant, wins, seconds, moves in ((a, wins_a, time_a, moves_a), (b, n - wins_a, time_b, moves_b)):
+            entrant_totals[entrant][0] += n
+            entrant_totals[entrant][1] += wins
+            entrant_totals[entrant][2] += seconds
+            entrant_totals[entrant][3] += moves
+
+    total_games = sum(n for n, _ in pairing_totals.values())
+    print(f"Played {total_games} games in {elapsed:.2f} seconds "
+          f"({total_games / elapsed if elapsed else 0.0:.1f} games/sec)")
+    print("=" * 50)
+
+    print("\nPairings (win rate of the first player, 95% CI):")
+    for (a, b), (n, wins_a) in pairing_totals.items():
+        low, high = wilson_interval(wins_a, n)
+        print(f"{names[a]:>10} vs {names[b]:<10} {wins_a:>5}/{n:<5} "
+              f"{wins_a/n*100:5.1f}%  [{low*100:5.1f}%, {high*100:5.1f}%]")
+
+    print("\nPlayers:")
+    for entrant, (n, wins, seconds, moves) in enumerate(entrant_totals):
+        low, high = wilson_interval(wins, n)
+        print(f"{entrant + 1}. {names[entrant]:>10}: {wins/n*100:5.1f}% "
+              f"[{low*100:5.1f}%, {high*100:5.1f}%] over {n} games, "
+              f"{seconds/moves*1000 if moves else 0.0:.3f} ms/move")
+
+    if record_path is not None:
+        with GameRecordWriter(record_path, size) as writer:
+            for result in results:
+                for data in result[6]:
+                    writer.write_encoded(data)
+        print(f"\nRecorded {len(writer)} games to {record_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", nargs="+", default=["random", "greedy", "defensive", "perfect"],
+                        choices=sorted(PLAYER_TYPES), metavar="PLAYER",
+                        help=f"player types to enter, from {', '.join(PLAYER_TYPES)}; "
+                             "a type may be entered twice (default: all four)")
+    parser.add_argument("--games", type=int, default=100,
+                        help="games per pairing, rounded up to an even number (default: 100)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (default: 1)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the deals and random players (default: random, printed)")
+    parser.add_argument("--size", type=int, default=4,
+                        help="board size (default: 4)")
+    parser.add_argument("--deck", type=int, nargs="+", default=None, metavar="VALUE",
+                        help="card values to deal, size*size of them with at least two 1s "
+                             "for the pawns (default: the standard deck for the size)")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="write every game to this game record file (collapsi_records)")
+    args = parser.parse_args()
+
+    if len(args.players) < 2:
+        parser.error("a tournament needs at least two players")
+    if args.deck is not None:
+        try:
+            check_deck(args.deck, args.size)
+        except ValueError as error:
+            parser.error(str(error))
+    run_tournament(args.players, args.games + args.games % 2, args.workers, args.seed,
+                   args.size, args.deck, args.record)
+
+
+if __name__ == "__main__":
+    main()
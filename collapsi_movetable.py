@@ -0,0 +1,76 @@
+"""
+Precomputed walk tables for Collapsi move generation.
+
+On a fixed torus, the self-avoiding walks of a given length from a given
+cell never change; only which of them are blocked does.  Each walk is stored
+as
+
+    (walk_mask, end_idx, path)
+
+where walk_mask has a bit set for every cell the walk enters (the start cell
+excluded), end_idx is the landing cell and path is the tuple of entered cell
+indices.  A walk is legal iff ``walk_mask & collapsed == 0`` and it does not
+end on the opponent's pawn; passing over the opponent is allowed.
+
+Only the landing cell matters for the resulting position (the start card
+collapses whatever the route), so reachable_destinations keeps just the
+first legal walk to each cell.
+
+Cells are indexed row-major (index = row*size + col).
+"""
+
+from functools import lru_cache
+from typing import List, Tuple
+
+Walk = Tuple[int, int, Tuple[int, ...]]
+
+# right, down, left, up — the order MoveValidator has always explored in
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+@lru_cache(maxsize=None)
+def neighbours(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """Adjacent cells of every cell with wrap-around, in DIRECTIONS order."""
+    return tuple(
+        tuple(((i // size + dr) % size) * size + (i % size + dc) % size for dr, dc in DIRECTIONS)
+        for i in range(size * size)
+    )
+
+
+@lru_cache(maxsize=None)
+def walk_table(size: int, steps: int) -> Tuple[Tuple[Walk, ...], ...]:
+    """For every start cell, all self-avoiding walks of exactly *steps* moves."""
+    nbrs = neighbours(size)
+    table = []
+    for start in range(size * size):
+        walks: List[Walk] = []
+        stack = [(start, steps, 1 << start, ())]
+        while stack:
+            cur, left, visited, path = stack.pop()
+            if left == 0:
+                if cur != start:
+                    walks.append((visited & ~(1 << start), cur, path))
+                continue
+            for nxt in reversed(nbrs[cur]):
+                if not visited & (1 << nxt):
+                    stack.append((nxt, left - 1, visited | (1 << nxt), path + (nxt,)))
+        table.append(tuple(walks))
+    return tuple(table)
+
+
+def legal_walks(walks: Tuple[Walk, ...], collapsed: int, opponent_idx: int) -> List[Walk]:
+    """Filter a walk_table entry down to the walks playable in this position."""
+    return [walk for walk in walks if not walk[0] & collapsed and walk[1] != opponent_idx]
+
+
+
+def reachable_destinations(walks: Tuple[Walk, ...], collapsed: int,
+                           opponent_idx: int) -> List[Walk]:
+    """The first legal walk to each reachable landing cell, in walk_table order."""
+    seen = 1 << opponent_idx if opponent_idx >= 0 else 0
+    reachable = []
+    for walk in walks:
+        if not walk[0] & collapsed and not seen >> walk[1] & 1:
+            seen |= 1 << walk[1]
+            reachable.append(walk)
+    return reachable
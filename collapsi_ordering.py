@@ -0,0 +1,77 @@
+"""
+Move ordering for the Collapsi solver.
+
+The minimax engines stop at the first winning move they find, so the order
+in which a state's moves are tried decides how much of the tree a solve
+expands; it never changes who wins.  PerfectAIPlayer takes one of:
+
+``"none"``
+    generation order, i.e. the order of collapsi_movetable's walks
+``"value"``
+    land on the highest card first.  The walks leaving each cell are
+    sorted once per deal, so the ordering costs nothing per node
+``"mobility"``
+    leave the opponent the fewest replies first (none at all is an
+    immediate win), ties broken by card value.  Counting the replies means
+    generating every child's moves once more
+
+Cold root solves of the 200 seeded benchmark deals (benchmark.py):
+
+    ordering      nodes   time
+    none        808,127   1.00
+    value       578,177   ~0.65
+    mobility    492,581   ~1.0
+
+"mobility" expands the fewest nodes but spends about as much time counting
+as it saves, so "value" is the default.  A history table of cutoffs keyed
+on the landing cell was tried as well; it expanded more nodes than
+generation order (462,029 over 100 deals against 414,398).
+"""
+
+from typing import Callable, List, Sequence, Tuple
+
+from collapsi_movetable import Walk
+
+ORDERINGS = ("none", "value", "mobility")
+
+MoveGenerator = Callable[[int, int, int], List[Tuple[int, ...]]]
+
+
+def order_walks(walks: Sequence[Tuple[Walk, ...]], values: Sequence[int],
+                ordering: str) -> List[Tuple[Walk, ...]]:
+    """Per-cell walks in the order the solver should try them."""
+    if ordering == "none":
+        return list(walks)
+    # stable, so walks to equal cards keep their generation order
+    return [tuple(sorted(cell_walks, key=lambda walk: -values[walk[1]])) for cell_walks in walks]
+
+
+def fewest_replies_first(walks: Sequence[Tuple[Walk, ...]]) -> MoveGenerator:
+    """A move generator for *walks* that sorts moves by the opponent's replies."""
+
+    def generate_moves(collapsed: int, start_idx: int, opponent_idx: int) -> List[Tuple[int, ...]]:
+        moves = []
+        seen = 1 << opponent_idx
+        for walk_mask, end, path in walks[start_idx]:
+            if not walk_mask & collapsed and not seen >> end & 1:
+                seen |= 1 << end
+                moves.append(path)
+        if len(moves) < 2:
+            return moves
+
+        after = collapsed | 1 << start_idx
+        replies = walks[opponent_idx]
+
+        def reply_count(path: Tuple[int, ...]) -> int:
+            count = 0
+            seen = 1 << path[-1]
+            for walk_mask, end, _ in replies:
+                if not walk_mask & after and not seen >> end & 1:
+                    seen |= 1 << end
+                    count += 1
+            return count
+
+        moves.sort(key=reply_count)
+        return moves
+
+    return generate_moves
@@ -0,0 +1,83 @@
+"""
+Search instrumentation for PerfectAIPlayer.
+
+A player built with ``profile=True`` (or a callable, which then receives
+every record) fills one SearchStats per solve: nodes expanded, cache
+lookups and hits, time spent generating moves, the deepest ply reached
+below the solved position and a histogram of branching factors (moves per
+expanded node).  It does so by timing move generation, which the minimax
+engines call exactly once per expanded node; without ``profile`` the engines
+run untouched.
+
+profile_deal() runs a single cold solve under cProfile, for the deals whose
+latency the counters alone do not explain.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+import cProfile
+import io
+import pstats
+
+
+@dataclass
+class SearchStats:
+    nodes: int = 0
+    lookups: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+    movegen_seconds: float = 0.0
+    max_depth: int = 0
+    branching: Counter = field(default_factory=Counter)  # moves per node -> nodes
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def mean_branching(self) -> float:
+        expanded = sum(self.branching.values())
+        return sum(b * n for b, n in self.branching.items()) / expanded if expanded else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "nodes": self.nodes,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "seconds": self.seconds,
+            "movegen_seconds": self.movegen_seconds,
+            "max_depth": self.max_depth,
+            "mean_branching": self.mean_branching,
+            "branching": dict(sorted(self.branching.items())),
+        }
+
+    def summary(self) -> str:
+        return (f"{self.nodes:,} nodes, {self.hit_rate*100:.0f}% cache hits, depth {self.max_depth}, "
+                f"branching {self.mean_branching:.2f}, {self.seconds*1000:.1f} ms "
+                f"({self.movegen_seconds*1000:.1f} ms move generation)")
+
+
+def profile_deal(values: Sequence[int], size: int = 4, engine: str = "iterative",
+                 limit: int = 25, dump_path: Optional[str] = None) -> str:
+    """cProfile a cold root solve of one deal; return the pstats report.
+
+    The raw profile is also written to *dump_path* if given, for pstats or
+    snakeviz.
+    """
+    from perfect_ai_player import PerfectAIPlayer
+
+    solver = PerfectAIPlayer(0, engine=engine, profile=True)
+    solver._initialise_from_values(values, size)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    solver._solve(*solver._root)
+    profiler.disable()
+    if dump_path:
+        profiler.dump_stats(dump_path)
+
+    out = io.StringIO()
+    out.write(f"Search: {solver.last_solve_stats.summary()}\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,256 @@
+"""
+Compact binary game records.
+
+A Game's move_history holds dicts of Position objects and full paths, which
+is bulky to store for millions of games and slow to read back.  A game
+record keeps only the deal and the moves:
+
+``deal``
+    one nibble per card value, row-major, low nibble first (8 bytes on
+    4x4).  The pawns start on the first two 1-cards, as Board.setup_from_values
+    places them
+``moves``
+    one varint per move (7 bits a byte, high bit set on all but the last
+    byte) holding ``variant * cells + destination``.  The variant is the
+    path's index among every walk of the mover's card value from its cell to
+    that destination (collapsi_movetable order), so decoding needs no
+    legality checks.  The walks a solver plays are almost always among the
+    first few, so a 4x4 move is usually one byte and never more than two
+
+A record file is a header, the records back to back, then an index of
+uint64 record offsets (one more than there are records, so record i spans
+``index[i]:index[i + 1]``).  GameRecordWriter streams records out and
+writes the index and header on close; a file whose writer never closed is
+rejected.  GameRecordReader maps the file, so opening even a 10M-game file
+reads only the header and every record is a zero-copy slice of the map.
+"""
+
+from array import array
+from functools import lru_cache
+from math import sqrt
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+import mmap
+import struct
+
+from collapsi_core import CardValue, Game, Position
+from collapsi_movetable import walk_table
+
+MAGIC = b"CLPSGR1\0"
+HEADER = struct.Struct("<8sHBxxxxxQQ")  # magic, version, board size, records, index offset
+HEADER_SIZE = 32
+VERSION = 1
+
+Path = Tuple[int, ...]
+
+
+@lru_cache(maxsize=None)
+def _walks_to(size: int, steps: int) -> Tuple[Dict[int, Tuple[Path, ...]], ...]:
+    """Per start cell: destination -> every walk path there, in walk_table order."""
+    table = []
+    for walks in walk_table(size, steps):
+        paths: Dict[int, List[Path]] = {}
+        for _, end, path in walks:
+            paths.setdefault(end, []).append(path)
+        table.append({end: tuple(variants) for end, variants in paths.items()})
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def _move_codes(size: int, steps: int) -> Tuple[Dict[Path, int], ...]:
+    """Per start cell: walk path -> its move code."""
+    cells = size * size
+    return tuple(
+        {path: variant * cells + end for end, variants in paths.items() for variant, path in enumerate(variants)}
+        for paths in _walks_to(size, steps)
+    )
+
+
+def _start_cells(values: Tuple[int, ...]) -> List[int]:
+    jacks = [i for i, v in enumerate(values) if v == CardValue.JACK.value][:2]
+    if len(jacks) < 2:
+        raise ValueError("a deal needs at least two 1-cards for the pawns to start on")
+    return jacks
+
+
+class GameRecord(NamedTuple):
+    values: Tuple[int, ...]  # row-major card values of the deal
+    paths: Tuple[Path, ...]  # cell-index paths of the moves, the first player's first
+
+    @property
+    def size(self) -> int:
+        return int(sqrt(len(self.values)))
+
+    @classmethod
+    def from_game(cls, game: Game) -> "GameRecord":
+        """The record of a game started from a deal (start_game or start_from_values)."""
+        board = game.board
+        s = board.size
+        values = tuple(board.grid[r][c].value.value for r in range(s) for c in range(s))
+        pawns = _start_cells(values)
+        paths = []
+        for entry in game.move_history:
+            start = entry['from']
+            if start.row * s + start.col != pawns[entry['player']]:
+                raise ValueError("the game did not start from its deal's starting position")
+            path = tuple(pos.row * s + pos.col for pos in entry['path'])
+            pawns[entry['player']] = path[-1]
+            paths.append(path)
+        return cls(values, tuple(paths))
+
+    def to_game(self) -> Game:
+        """Replay the record; raises ValueError on an illegal move."""
+        s = self.size
+        game = Game(s, tuple(sorted(self.values)))
+        game.start_from_values(self.values)
+        for path in self.paths:
+            if not game.make_move([Position(i // s, i % s) for i in path]):
+                raise ValueError(f"illegal move {path} in game record")
+        return game
+
+
+def encode_record(record: GameRecord) -> bytes:
+    size = record.size
+    cells = size * size
+    values = record.values
+    out = bytearray((cells + 1) // 2)
+    for i, value in enumerate(values):
+        if not 0 < value < 16:
+            raise ValueError(f"card value {value} does not fit a nibble")
+        out[i >> 1] |= value << 4 * (i & 1)
+
+    pawns = _start_cells(values)
+    player = 0
+    for path in record.paths:
+        start = pawns[player]
+        code = _move_codes(size, values[start])[start].get(tuple(path))
+        if code is None:
+            raise ValueError(f"{path} is not a walk from cell {start}")
+        while code >= 0x80:
+            out.append(code & 0x7F | 0x80)
+            code >>= 7
+        out.append(code)
+        pawns[player] = path[-1]
+        player ^= 1
+    return bytes(out)
+
+
+def decode_record(data: bytes, size: int = 4) -> GameRecord:
+    """Inverse of encode_record; *data* may be any buffer, e.g. a memoryview."""
+    cells = size * size
+    deal_bytes = (cells + 1) // 2
+    values = tuple(data[i >> 1] >> 4 * (i & 1) & 0xF for i in range(cells))
+
+    pawns = _start_cells(values)
+    player = 0
+    paths = []
+    code = shift = 0
+    try:
+        for byte in data[deal_bytes:]:
+            code |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            start = pawns[player]
+            variant, end = divmod(code, cells)
+            paths.append(_walks_to(size, values[start])[start][end][variant])
+            pawns[player] = end
+            player ^= 1
+            code = shift = 0
+    except (KeyError, IndexError):
+        raise ValueError("corrupt game record") from None
+    if shift:
+        raise ValueError("game record ends inside a move")
+    return GameRecord(values, tuple(paths))
+
+
+class GameRecordWriter:
+    """Stream game records to *path*; the file is complete once closed."""
+
+    def __init__(self, path: str, size: int = 4):
+        self.path = path
+        self.size = size
+        self._file = open(path, "wb")
+        self._file.write(bytes(HEADER_SIZE))
+        self._offsets = array("Q", [HEADER_SIZE])
+
+    def write(self, record: GameRecord):
+        if record.size != self.size:
+            raise ValueError(f"{self.path} holds {self.size}x{self.size} games")
+        self.write_encoded(encode_record(record))
+
+    def write_game(self, game: Game):
+        self.write(GameRecord.from_game(game))
+
+    def write_encoded(self, data: bytes):
+        """Append a record already encoded with encode_record, e.g. by a worker process."""
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        # 8-byte aligned, so the reader can view the index in place
+        index_offset = -self._offsets[-1] % 8 + self._offsets[-1]
+        self._file.write(bytes(index_offset - self._offsets[-1]))
+        self._file.write(self._offsets.tobytes())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.size, len(self), index_offset))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GameRecordReader:
+    """Random access to a game record file through a memory map."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, count, index_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a complete version {VERSION} Collapsi game record file")
+        self.size = size
+        self._data = memoryview(self._map)
+        # offsets are little-endian uint64; the mapped view reads them natively
+        self._index = self._data[index_offset:index_offset + 8 * (count + 1)].cast("Q")
+
+    def __len__(self) -> int:
+        return len(self._index) - 1
+
+    def raw(self, i: int) -> memoryview:
+        """Record i as encoded, without copying."""
+        if not 0 <= i < len(self):
+            raise IndexError(f"game record {i} out of range")
+        return self._data[self._index[i]:self._index[i + 1]]
+
+    def __getitem__(self, i: int) -> GameRecord:
+        if i < 0:
+            i += len(self)
+        return decode_record(self.raw(i), self.size)
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for i in range(len(self)):
+            yield decode_record(self.raw(i), self.size)
+
+    def game(self, i: int) -> Game:
+        return self[i].to_game()
+
+    def close(self):
+        self._index.release()
+        self._data.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,216 @@
+"""
+Symmetries of the Collapsi torus.
+
+A square board that wraps in both directions looks the same after any of the
+size*size translations, and after any of the 8 rotations/reflections of the
+square.  Together these give 8*size*size permutations of the cell indices
+(128 on the standard 4x4 board) that preserve adjacency, so a position and
+its image under any of them have the same game-theoretic value.
+
+Cells are indexed row-major (index = row*size + col), matching
+PerfectAIPlayer.  A permutation ``perm`` maps cell ``i`` to cell ``perm[i]``.
+"""
+
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import combinations
+from math import sqrt
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from collapsi_core import CardValue, standard_deck
+
+Permutation = Tuple[int, ...]
+
+# Set on the cell holding the second pawn inside a canonical deal key.
+PAWN_MARK = 0x80
+
+
+@lru_cache(maxsize=None)
+def torus_symmetries(size: int) -> Tuple[Permutation, ...]:
+    """Every adjacency-preserving permutation of a size x size torus, identity first."""
+    s = size
+    dihedral: List[Callable[[int, int], Tuple[int, int]]] = [
+        lambda r, c: (r, c),
+        lambda r, c: (c, -r),
+        lambda r, c: (-r, -c),
+        lambda r, c: (-c, r),
+        lambda r, c: (r, -c),
+        lambda r, c: (-r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (-c, -r),
+    ]
+    perms = []
+    for transform in dihedral:
+        for dr in range(s):
+            for dc in range(s):
+                perm = []
+                for i in range(s * s):
+                    r, c = transform(i // s, i % s)
+                    perm.append(((r + dr) % s) * s + (c + dc) % s)
+                perms.append(tuple(perm))
+    # on tiny boards some transforms coincide
+    return tuple(dict.fromkeys(perms))
+
+
+def invert(perm: Permutation) -> Permutation:
+    inverse = [0] * len(perm)
+    for i, j in enumerate(perm):
+        inverse[j] = i
+    return tuple(inverse)
+
+
+def apply_to_grid(perm: Permutation, grid: Sequence[int]) -> Tuple[int, ...]:
+    """Move the contents of every cell i to cell perm[i]."""
+    return tuple(grid[i] for i in invert(perm))
+
+
+# --------------------------------------------------------------------------
+# Canonical deals
+# --------------------------------------------------------------------------
+
+
+@lru_cache(maxsize=None)
+def _pawn_to_origin(size: int) -> Tuple[Tuple[Tuple[Permutation, Callable], ...], ...]:
+    """For each cell p, (perm, item getter rebuilding the grid) for every symmetry sending p to cell 0.
+
+    Translations act freely on the cells, so fixing where the first pawn goes
+    leaves only the rotations/reflections about it: 8 candidates instead of
+    the whole group.
+    """
+    candidates = []
+    for p in range(size * size):
+        candidates.append(tuple(
+            (perm, itemgetter(*invert(perm)))
+            for perm in torus_symmetries(size)
+            if perm[p] == 0
+        ))
+    return tuple(candidates)
+
+
+@lru_cache(maxsize=None)
+def _pawn_to_origin_getters(size: int) -> Tuple[Tuple[Callable, ...], ...]:
+    return tuple(tuple(getter for _, getter in cell) for cell in _pawn_to_origin(size))
+
+
+def canonical_deal(values: Sequence[int], p0: int, p1: int, size: int = 4) -> bytes:
+    """Canonical key for the uncollapsed position (values, p0, p1) with the p0 pawn to move.
+
+    Two deals get the same key iff some torus symmetry maps one onto the
+    other, so they have the same outcome.  In the key the pawn to move sits
+    on cell 0 and the other pawn's cell carries PAWN_MARK.
+    """
+    marked = list(values)
+    marked[p1] |= PAWN_MARK
+    return min(bytes(getter(marked)) for getter in _pawn_to_origin_getters(size)[p0])
+
+
+def canonical_deal_transform(values: Sequence[int], p0: int, p1: int,
+                             size: int = 4) -> Tuple[bytes, Permutation]:
+    """canonical_deal plus a symmetry mapping the deal onto its canonical form."""
+    marked = list(values)
+    marked[p1] |= PAWN_MARK
+    return min(
+        ((bytes(getter(marked)), perm) for perm, getter in _pawn_to_origin(size)[p0]),
+        key=lambda candidate: candidate[0],
+    )
+
+
+def decode_deal(key: bytes) -> Tuple[Tuple[int, ...], int, int, int]:
+    """Inverse of canonical_deal: return (values, p0, p1, size)."""
+    size = int(sqrt(len(key)))
+    p1 = next(i for i, b in enumerate(key) if b & PAWN_MARK)
+    values = tuple(b & ~PAWN_MARK for b in key)
+    return values, 0, p1, size
+
+
+# --------------------------------------------------------------------------
+# Deal classes
+# --------------------------------------------------------------------------
+
+
+def distinct_layouts(values: Sequence[int]) -> Iterator[Tuple[int, ...]]:
+    """Yield every distinct row-major arrangement of a multiset of card values."""
+    counts = Counter(values)
+    kinds = sorted(counts)
+    grid = [0] * len(values)
+
+    def place(free: List[int], k: int):
+        kind = kinds[k]
+        if k == len(kinds) - 1:
+            for i in free:
+                grid[i] = kind
+            yield tuple(grid)
+            return
+        for chosen in combinations(free, counts[kind]):
+            for i in chosen:
+                grid[i] = kind
+            taken = set(chosen)
+            yield from place([i for i in free if i not in taken], k + 1)
+
+    yield from place(list(range(len(values))), 0)
+
+
+def enumerate_deal_classes(size=4) -> Dict[bytes, int]:
+    """Map each canonical deal to the number of distinct standard deals it stands for.
+
+    A deal is a layout of card values; the pawns go on the first two Jacks in
+    row-major order, as Board.setup_standard_game places them.  The two Jacks
+    are interchangeable cards, so swapping them is the same deal and each
+    layout is visited once.  Layouts related by a torus translation,
+    rotation or reflection fold into one class.
+    """
+    deck = list(standard_deck(size))
+    jack = CardValue.JACK.value
+    classes: Dict[bytes, int] = defaultdict(int)
+
+    for n, values in enumerate(distinct_layouts(deck)):
+        if n % 1000000 == 0 and n:
+            print(f"Enumerated {n} layouts, {len(classes)} classes so far...")
+        p0 = values.index(jack)
+        p1 = values.index(jack, p0 + 1)
+        classes[canonical_deal(values, p0, p1, size)] += 1
+
+    return classes
+
+
+# --------------------------------------------------------------------------
+# Automorphisms of a deal
+# --------------------------------------------------------------------------
+
+
+def grid_automorphisms(values: Sequence[int], size: int = 4) -> List[Permutation]:
+    """Non-identity symmetries that leave the card-value layout unchanged."""
+    return [
+        perm for perm in torus_symmetries(size)[1:]
+        if all(values[perm[i]] == values[i] for i in range(size * size))
+    ]
+
+
+def mask_permuter(perm: Permutation) -> Callable[[int], int]:
+    """Return a function moving bit i of a cell mask to bit perm[i], one byte at a time."""
+    tables = []
+    for base in range(0, len(perm), 8):
+        table = []
+        for byte in range(256):
+            moved = 0
+            for bit in range(min(8, len(perm) - base)):
+                if byte >> bit & 1:
+                    moved |= 1 << perm[base + bit]
+            table.append(moved)
+        tables.append(table)
+
+    if len(tables) == 2:
+        lo, hi = tables
+
+        def permute(mask: int) -> int:
+            return lo[mask & 0xFF] | hi[mask >> 8]
+    else:
+        def permute(mask: int) -> int:
+            moved = 0
+            for table in tables:
+                moved |= table[mask & 0xFF]
+                mask >>= 8
+            return moved
+
+    return permute
@@ -0,0 +1,226 @@
+"""
+Persistent, memory-mapped tablebase of solved Collapsi deals.
+
+Deals are keyed by collapsi_symmetry.canonical_deal, so every deal in a
+symmetry class shares one record.  A tablebase is two files:
+
+``<path>``
+    A fixed-capacity open-addressing hash table.  Each slot holds the
+    canonical key, the root outcome for the player to move first, that
+    player's best first move (in canonical coordinates) and, optionally, the
+    location of the deal's per-state results in the states file.
+
+``<path>.states``
+    Append-only.  Per-state results of a deal are one sorted run of uint64
+    codes ``state_code << 1 | won`` (see state_code), so a single state is
+    found by binary search without reading the rest.
+
+Both files are memory-mapped, so any number of reader processes share the
+same pages through the OS cache instead of loading the table into RAM.
+Writers serialise on an exclusive file lock (where fcntl exists).  A slot
+becomes visible only once its outcome byte is written, after the rest of
+the record, so readers never need the lock.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; single-writer use only
+    fcntl = None
+
+MAGIC = b"CLPSTB1\0"
+HEADER = struct.Struct("<8sHHBxxxQ")  # magic, version, key size, log2(slots), records
+HEADER_SIZE = 64
+VERSION = 1
+MAX_PATH = 6
+
+DEFAULT_CAPACITY_BITS = 23  # 8M slots, enough for every 4x4 deal class
+MAX_LOAD = 0.75
+
+EMPTY, WIN, LOSS = 0, 1, 2
+
+
+class TablebaseFull(Exception):
+    pass
+
+
+class DealEntry(NamedTuple):
+    outcome: int  # +1 / -1 for the player to move first
+    best_path: Optional[Tuple[int, ...]]  # canonical coordinates
+    states_offset: int
+    states_count: int
+
+
+def state_code(collapsed: int, p0_idx: int, p1_idx: int, current: int, cells: int) -> int:
+    """Pack a solver state into one integer (mixed radix, collapsed mask most significant)."""
+    return ((collapsed * cells + p0_idx) * cells + p1_idx) * 2 + current
+
+
+def open_default_tablebase() -> Optional["Tablebase"]:
+    """Open the tablebase named by $COLLAPSI_TABLEBASE, if set."""
+    path = os.environ.get("COLLAPSI_TABLEBASE")
+    return Tablebase(path) if path else None
+
+
+class Tablebase:
+    def __init__(self, path: str, key_size: int = 16, capacity_bits: int = DEFAULT_CAPACITY_BITS,
+                 readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._record = struct.Struct(f"<{key_size}sBB{MAX_PATH}sQI4x")
+        self._slot_head = struct.Struct(f"<{key_size}sB")  # key, outcome
+
+        if not os.path.exists(path):
+            if readonly:
+                raise FileNotFoundError(path)
+            self._create(path, key_size, capacity_bits)
+
+        self._file = open(path, "rb" if readonly else "r+b")
+        access = mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+
+        magic, version, stored_key_size, bits, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} Collapsi tablebase")
+        if stored_key_size != key_size:
+            raise ValueError(f"{path} holds {stored_key_size}-byte keys, not {key_size}")
+        self.key_size = key_size
+        self.capacity = 1 << bits
+
+        self._states_path = path + ".states"
+        if not os.path.exists(self._states_path) and not readonly:
+            open(self._states_path, "wb").close()
+        self._states_file = open(self._states_path, "rb" if readonly else "r+b")
+        # codes are little-endian uint64; the mapped view reads them natively
+        self._states_map: Optional[mmap.mmap] = None
+        self._states_view: Optional[memoryview] = None
+
+    @staticmethod
+    def _create(path: str, key_size: int, capacity_bits: int):
+        record_size = key_size + 24
+        with open(path, "wb") as f:
+            header = HEADER.pack(MAGIC, VERSION, key_size, capacity_bits, 0)
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            # sparse: pages are only allocated once a slot is written
+            f.truncate(HEADER_SIZE + record_size * (1 << capacity_bits))
+
+    # ---- context manager --------------------------------------------------
+
+    def close(self):
+        if self._states_view is not None:
+            self._states_view.release()
+            self._states_view = None
+        if self._states_map is not None:
+            self._states_map.close()
+            self._states_map = None
+        self._map.close()
+        self._file.close()
+        self._states_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return HEADER.unpack_from(self._map, 0)[4]
+
+    # ---- slots --------------------------------------------------------------
+
+    def _probe(self, key: bytes):
+        """Yield (slot offset, stored key, outcome) along the probe sequence of *key*."""
+        record_size = self._record.size
+        slot_head = self._slot_head
+        mask = self.capacity - 1
+        slot = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") & mask
+        for _ in range(self.capacity):
+            offset = HEADER_SIZE + slot * record_size
+            stored_key, outcome = slot_head.unpack_from(self._map, offset)
+            yield offset, stored_key, outcome
+            slot = (slot + 1) & mask
+
+    def lookup(self, key: bytes) -> Optional[DealEntry]:
+        """The record for a canonical deal key, or None if it has not been solved."""
+        for offset, stored_key, outcome in self._probe(key):
+            if outcome == EMPTY:
+                return None
+            if stored_key == key:
+                _, _, path_len, path, states_offset, states_count = self._record.unpack_from(self._map, offset)
+                best_path = tuple(path[:path_len]) if path_len else None
+                return DealEntry(1 if outcome == WIN else -1, best_path, states_offset, states_count)
+        return None
+
+    def store(self, key: bytes, outcome: int, best_path: Optional[Tuple[int, ...]],
+              states: Optional[Dict[int, int]] = None):
+        """Record a solved deal; *states* optionally maps state_code to +1/-1."""
+        if self.readonly:
+            raise PermissionError(f"{self.path} is open read-only")
+        if len(key) != self.key_size:
+            raise ValueError(f"key must be {self.key_size} bytes")
+        if best_path is not None and len(best_path) > MAX_PATH:
+            raise ValueError(f"paths longer than {MAX_PATH} cells cannot be stored")
+
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            for offset, stored_key, stored_outcome in self._probe(key):
+                if stored_outcome != EMPTY and stored_key == key:
+                    return  # already solved by someone else
+                if stored_outcome == EMPTY:
+                    break
+
+            count = len(self)
+            if count + 1 > MAX_LOAD * self.capacity:
+                raise TablebaseFull(f"{self.path} holds {count} deals; recreate it larger")
+
+            states_offset, states_count = self._append_states(states) if states else (0, 0)
+            path = bytes(best_path or ())
+            # write everything but the outcome, then the outcome to publish the slot
+            self._record.pack_into(self._map, offset, key, EMPTY, len(path), path,
+                                   states_offset, states_count)
+            self._map[offset + self.key_size] = WIN if outcome == 1 else LOSS
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.key_size,
+                             self.capacity.bit_length() - 1, count + 1)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    # ---- per-state results -------------------------------------------------
+
+    def _append_states(self, states: Dict[int, int]) -> Tuple[int, int]:
+        codes = sorted(code << 1 | (value > 0) for code, value in states.items())
+        self._states_file.seek(0, os.SEEK_END)
+        offset = self._states_file.tell()
+        self._states_file.write(struct.pack(f"<{len(codes)}Q", *codes))
+        self._states_file.flush()
+        return offset, len(codes)
+
+    def _states(self, entry: DealEntry) -> memoryview:
+        end = entry.states_offset + 8 * entry.states_count
+        if self._states_map is None or end > len(self._states_map):
+            # the file grew since it was mapped (or was empty)
+            if self._states_view is not None:
+                self._states_view.release()
+            if self._states_map is not None:
+                self._states_map.close()
+            self._states_map = mmap.mmap(self._states_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._states_view = memoryview(self._states_map).cast("Q")
+        first = entry.states_offset // 8
+        return self._states_view[first:first + entry.states_count]
+
+    def state_value(self, entry: DealEntry, code: int) -> Optional[int]:
+        """+1/-1 for the player to move in the given state, or None if it was not stored."""
+        if not entry.states_count:
+            return None
+        run = self._states(entry)
+        i = bisect_left(run, code << 1)
+        if i < len(run) and run[i] >> 1 == code:
+            return 1 if run[i] & 1 else -1
+        return None
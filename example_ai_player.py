@@ -3,6 +3,17 @@ from collapsi_core import Position, Game
 from player_interface import Player
 
 
+def _one_path_per_destination(game: Game, valid_moves: List[List[Position]]) -> List[List[Position]]:
+    """The first of *valid_moves* to each landing cell, in order of first appearance."""
+    if valid_moves is game.get_valid_moves():
+        return list(game.get_reachable_destinations().values())
+    # a caller may offer only some of the legal moves; never leave that list
+    paths = {}
+    for move in valid_moves:
+        paths.setdefault(move[-1], move)
+    return list(paths.values())
+
+
 class GreedyAIPlayer(Player):
     def __init__(self, player_id: int, name: str = None):
         if name is None:
@@ -16,7 +27,8 @@ class GreedyAIPlayer(Player):
         best_move = None
         best_score = -1
         
-        for move in valid_moves:
+        # the score only depends on where the move lands
+        for move in _one_path_per_destination(game, valid_moves):
             score = self.evaluate_move(game, move)
             if score > best_score:
                 best_score = score
@@ -72,7 +84,8 @@ class DefensiveAIPlayer(Player):
         best_move = None
         best_score = float('inf')
         
-        for move in valid_moves:
+        # the risk only depends on where the move lands
+        for move in _one_path_per_destination(game, valid_moves):
             score = self.evaluate_risk(game, move)
             if score < best_score:
                 best_score = score
@@ -122,8 +135,7 @@ class DefensiveAIPlayer(Player):
         return risk
     
     def _simulate_move(self, game: Game, move: List[Position]):
-        from copy import deepcopy
-        temp_board = deepcopy(game.board)
+        temp_board = game.board.clone()
         start_pos = game.get_current_player_position()
         temp_board.collapse_card(start_pos)
         return temp_board
\ No newline at end of file
@@ -0,0 +1,391 @@
+"""
+MCTSPlayer — an anytime Monte Carlo Tree Search AI for Collapsi.
+
+PerfectAIPlayer searches the whole game tree, which is only practical
+because a 4 × 4 deal is small.  MCTSPlayer instead spends a fixed budget per
+move, *time_budget* seconds or *playouts* playouts, whichever runs out
+first, growing a UCT tree (UCB1 with constant *exploration*) and finishing
+every iteration with a uniformly random playout.  It can be stopped at any
+time and then plays the move it has visited most.
+
+Results that are certain are propagated as proofs (MCTS-Solver): a node
+whose player to move is stuck is a proven win for the player who moved
+into it, a node with a child proven won is a proven loss, and a node whose
+children are all proven losses is a proven win.  Proven losses are never
+selected again, a proven win is always played, and the search stops as soon
+as the root itself is proven.
+
+Positions use the solver's encoding (collapsed_mask, p0_idx, p1_idx,
+player_to_move) and its precomputed walk tables; as in the solver only the
+landing cell of a move matters, so a node has one child per reachable
+destination.  Playouts run on plain ints without building any states.
+
+The tree is kept between calls: on its next turn the player looks for the
+new position two plies (its move, then the reply) below the last root, and
+continues from there with the visits already spent on it.
+
+With ``workers > 1`` the search is root-parallel: every worker process grows
+its own tree from the position with its own seed (keeping it for reuse in
+the same way) and the visit counts of the root moves are summed.  Each
+worker takes exactly one search per move, so no tree is counted twice and
+the time budget is spent once.  The pool is started on first use and shut
+down by on_game_end() or close().
+"""
+
+from math import log, sqrt
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import multiprocessing
+import random
+import time
+
+from collapsi_core import Game, Position
+from collapsi_movetable import Walk, walk_table
+from player_interface import Player
+
+State = Tuple[int, int, int, int]  # (collapsed_mask, p0_idx, p1_idx, current)
+
+# iterations between checks of the clock and of cancel_move
+CHECK_ITERATIONS = 32
+
+
+class _Node:
+    """A position in the tree; wins and proven count for the player who moved into it.
+
+    proven is 1 for a proven win, -1 for a proven loss and 0 while unknown.
+    """
+
+    __slots__ = ("state", "path", "children", "untried", "visits", "wins", "proven")
+
+    def __init__(self, state: State, path: Optional[Tuple[int, ...]],
+                 untried: List[Tuple[int, ...]]):
+        self.state = state
+        self.path = path
+        self.children: List[_Node] = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0
+        self.proven = 0
+
+
+def deal_walks(values: Sequence[int], size: int = 4) -> List[Tuple[Walk, ...]]:
+    """Walks leaving each cell for that cell's card value."""
+    return [walk_table(size, v)[i] for i, v in enumerate(values)]
+
+
+def _moves(walks: Sequence[Tuple[Walk, ...]], state: State) -> List[Tuple[int, ...]]:
+    """One legal path to each reachable landing cell of the player to move."""
+    collapsed, p0_idx, p1_idx, current = state
+    start, opponent = (p0_idx, p1_idx) if current == 0 else (p1_idx, p0_idx)
+    moves = []
+    seen = 1 << opponent
+    for walk_mask, end, path in walks[start]:
+        if not walk_mask & collapsed and not seen >> end & 1:
+            seen |= 1 << end
+            moves.append(path)
+    return moves
+
+
+def _play(state: State, end: int) -> State:
+    collapsed, p0_idx, p1_idx, current = state
+    if current == 0:
+        return collapsed | 1 << p0_idx, end, p1_idx, 1
+    return collapsed | 1 << p1_idx, p0_idx, end, 0
+
+
+def playout(walks: Sequence[Tuple[Walk, ...]], state: State, rng_random) -> int:
+    """Play uniformly random moves from *state* to the end; return the winner."""
+    collapsed, p0_idx, p1_idx, current = state
+    pawns = [p0_idx, p1_idx]
+    while True:
+        start = pawns[current]
+        ends = []
+        seen = 1 << pawns[1 - current]
+        for walk_mask, end, _ in walks[start]:
+            if not walk_mask & collapsed and not seen >> end & 1:
+                seen |= 1 << end
+                ends.append(end)
+        if not ends:
+            return 1 - current
+        collapsed |= 1 << start
+        pawns[current] = ends[int(rng_random() * len(ends))]
+        current ^= 1
+
+
+def find_subtree(root: Optional[_Node], state: State) -> Optional[_Node]:
+    """The node for *state* at most two plies below *root*, if it was grown."""
+    if root is None:
+        return None
+    if root.state == state:
+        return root
+    for child in root.children:
+        for grandchild in child.children:
+            if grandchild.state == state:
+                return grandchild
+    return None
+
+
+def search(walks: Sequence[Tuple[Walk, ...]], root: _Node, deadline: float,
+           max_playouts: Optional[int], exploration: float, rng: random.Random,
+           should_stop: Callable[[int, int], bool] = lambda playouts, nodes: False) -> Tuple[int, int]:
+    """Grow *root* until the deadline, the playout budget or should_stop().
+
+    should_stop(playouts, nodes added) is called every CHECK_ITERATIONS
+    iterations, so it can also report progress.  Returns (playouts, nodes
+    added).
+    """
+    rng_random = rng.random
+    perf_counter = time.perf_counter
+    playouts = nodes = 0
+    while True:
+        if playouts % CHECK_ITERATIONS == 0 and playouts and (
+                perf_counter() >= deadline or should_stop(playouts, nodes)):
+            break
+        if root.proven or max_playouts is not None and playouts >= max_playouts:
+            break
+
+        # ---- select by UCB1, skipping proven losses, down to a node with an
+        # untried move (an unproven node always has an unproven child)
+        node = root
+        visited = [node]
+        while not node.untried and not node.proven:
+            log_visits = log(node.visits)
+            best_score = -1.0
+            for child in node.children:
+                if child.proven == -1:
+                    continue
+                score = child.wins / child.visits + exploration * sqrt(log_visits / child.visits)
+                if score > best_score:
+                    best_score = score
+                    best = child
+            node = best
+            visited.append(node)
+
+        # ---- expand one move, then play out from the new node
+        if node.untried:
+            path = node.untried.pop()
+            state = _play(node.state, path[-1])
+            child = _Node(state, path, _moves(walks, state))
+            if not child.untried:
+                child.proven = 1  # the player to move is stuck
+            node.children.append(child)
+            node = child
+            visited.append(node)
+            nodes += 1
+        if node.proven:
+            winner = 1 - node.state[3] if node.proven == 1 else node.state[3]
+        else:
+            winner = playout(walks, node.state, rng_random)
+
+        for node in visited:
+            node.visits += 1
+            if winner != node.state[3]:
+                node.wins += 1
+        playouts += 1
+
+        # ---- hand proofs up as far as they decide the parent
+        for i in range(len(visited) - 1, 0, -1):
+            child, parent = visited[i], visited[i - 1]
+            if child.proven == 1:
+                parent.proven = -1
+            elif child.proven == -1 and not parent.untried \
+                    and all(sibling.proven == -1 for sibling in parent.children):
+                parent.proven = 1
+            else:
+                break
+    return playouts, nodes
+
+
+RootMoves = Dict[int, Tuple[int, int, int, Tuple[int, ...]]]
+
+
+def root_moves(root: _Node) -> RootMoves:
+    """landing cell -> (proven, visits, wins, path) for every expanded root move."""
+    return {child.path[-1]: (child.proven, child.visits, child.wins, child.path)
+            for child in root.children}
+
+
+def best_move(moves: RootMoves) -> Tuple[int, int, int, Tuple[int, ...]]:
+    """A proven win if there is one, else the most visited move not proven lost."""
+    return max(moves.values(), key=lambda move: (move[0], move[1]) if move[0] != -1 else (-2, move[1]))
+
+
+# ---- root-parallel workers ------------------------------------------------
+
+# per worker process: (values, the root of its last search)
+_worker_tree: Tuple[Tuple[int, ...], Optional[_Node]] = ((), None)
+_worker_cancel = None
+_worker_barrier = None
+
+
+def _init_worker(cancel_event, barrier):
+    global _worker_cancel, _worker_barrier
+    _worker_cancel = cancel_event
+    _worker_barrier = barrier
+
+
+def _search_worker(task) -> Tuple[RootMoves, int, int, int]:
+    """Search one position in a worker; returns (root visits, playouts, nodes, reused visits)."""
+    global _worker_tree
+    values, size, state, deadline_seconds, max_playouts, exploration, seed = task
+    # one task per worker: a worker waiting here cannot take a second task
+    # of the move, and none starts its clock until every worker has one
+    _worker_barrier.wait()
+    walks = deal_walks(values, size)
+    root = find_subtree(_worker_tree[1], state) if _worker_tree[0] == values else None
+    if root is None:
+        root = _Node(state, None, _moves(walks, state))
+    reused = root.visits
+    _worker_tree = (values, root)
+    playouts, nodes = search(walks, root, time.perf_counter() + deadline_seconds, max_playouts,
+                             exploration, random.Random(seed),
+                             lambda playouts, nodes: _worker_cancel.is_set())
+    return root_moves(root), playouts, nodes, reused
+
+
+class MCTSPlayer(Player):
+    """Anytime UCT player with tree reuse and optional root parallelism."""
+
+    def __init__(
+        self,
+        player_id: int,
+        name: Optional[str] = None,
+        time_budget: Optional[float] = 1.0,
+        playouts: Optional[int] = None,
+        exploration: float = sqrt(2),
+        workers: int = 1,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(player_id, name or f"MCTS AI {player_id + 1}")
+        if time_budget is None and playouts is None:
+            raise ValueError("MCTSPlayer needs a time_budget, a playouts budget or both")
+        self.time_budget = time_budget
+        self.playouts = playouts
+        self.exploration = exploration
+        self.workers = workers
+        self._rng = random.Random(seed)
+        self._values: Tuple[int, ...] = ()
+        self._size = 4
+        self._walks: List[Tuple[Walk, ...]] = []
+        self._root: Optional[_Node] = None  # root of the last search, kept for reuse
+        self._pool = None
+        self._cancel_event = None
+        self._cancelled = False
+        # counters of the current or last move
+        self._playouts = 0
+        self._nodes = 0
+        self._reused = 0
+        self._seconds = 0.0
+        self._win_rate = 0.0
+
+    # ---- Player interface ----------------------------------------------
+
+    def get_move(
+        self,
+        game: Game,
+        valid_moves: List[List[Position]],
+    ) -> Optional[List[Position]]:
+        if not valid_moves:
+            return None
+
+        self._cancelled = False
+        board = game.board
+        s = board.size
+        values = tuple(board.grid[r][c].value.value for r in range(s) for c in range(s))
+        if values != self._values or s != self._size:
+            self._values, self._size = values, s
+            self._walks = deal_walks(values, s)
+            self._root = None
+        p0 = board.player_positions[0]
+        p1 = board.player_positions[1]
+        state = (board.collapsed_mask(), p0.row * s + p0.col, p1.row * s + p1.col, game.current_player)
+
+        self._playouts = self._nodes = self._reused = 0
+        self._seconds = 0.0
+        start_time = time.perf_counter()
+        if self.workers > 1:
+            moves = self._search_parallel(state)
+        else:
+            moves = self._search_local(state, start_time)
+        self._seconds = time.perf_counter() - start_time
+
+        if not moves:
+            return valid_moves[0]
+        proven, visits, wins, path = best_move(moves)
+        self._win_rate = 1.0 if proven == 1 else 0.0 if proven == -1 else wins / visits
+        return [Position(i // s, i % s) for i in path]
+
+    def cancel_move(self):
+        """Make a running get_move stop early and play its best move so far."""
+        self._cancelled = True
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+
+    def on_game_start(self, game: Game):
+        self._root = None
+
+    def on_game_end(self, game: Game, winner: int):
+        self._root = None
+        self.close()
+
+    def search_stats(self) -> Dict[str, float]:
+        """Playouts, tree nodes added and reused visits of the current or last move."""
+        seconds = self._seconds
+        stats = {
+            "nodes": self._nodes,
+            "playouts": self._playouts,
+            "reused_visits": self._reused,
+            "seconds": seconds,
+            "playouts_per_sec": self._playouts / seconds if seconds else 0.0,
+        }
+        if seconds:
+            stats["last_solve"] = (f"{self._playouts:,} playouts ({stats['playouts_per_sec']:,.0f}/s), "
+                                   f"{self._reused:,} reused, best move wins {self._win_rate*100:.0f}%")
+        return stats
+
+    def close(self):
+        """Shut down the worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            self._cancel_event = None
+
+    # --------------------------------------------------------------------
+
+    def _search_local(self, state: State, start_time: float) -> RootMoves:
+        root = find_subtree(self._root, state)
+        if root is None:
+            root = _Node(state, None, _moves(self._walks, state))
+        self._root = root
+        self._reused = root.visits
+        deadline = start_time + self.time_budget if self.time_budget is not None else float("inf")
+        self._playouts, self._nodes = search(self._walks, root, deadline, self.playouts,
+                                             self.exploration, self._rng, self._progress)
+        return root_moves(root)
+
+    def _progress(self, playouts: int, nodes: int) -> bool:
+        self._playouts, self._nodes = playouts, nodes
+        return self._cancelled
+
+    def _search_parallel(self, state: State) -> RootMoves:
+        if self._pool is None:
+            self._cancel_event = multiprocessing.Event()
+            self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker,
+                                              initargs=(self._cancel_event,
+                                                        multiprocessing.Barrier(self.workers)))
+        self._cancel_event.clear()
+        budget = self.time_budget if self.time_budget is not None else float("inf")
+        playouts = -(-self.playouts // self.workers) if self.playouts is not None else None
+        tasks = [(self._values, self._size, state, budget, playouts, self.exploration,
+                  self._rng.getrandbits(32)) for _ in range(self.workers)]
+
+        moves: RootMoves = {}
+        for worker_moves, playouts, nodes, reused in self._pool.map(_search_worker, tasks, chunksize=1):
+            self._playouts += playouts
+            self._nodes += nodes
+            self._reused += reused
+            # a proof from any worker holds for all of them
+            for end, (proven, visits, wins, path) in worker_moves.items():
+                total_proven, total_visits, total_wins, _ = moves.get(end, (0, 0, 0, path))
+                moves[end] = (proven or total_proven, total_visits + visits, total_wins + wins, path)
+        return moves
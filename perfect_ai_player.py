@@ -3,41 +3,164 @@
 from __future__ import annotations
 
 """
-PerfectAIPlayer — a game‑theoretic optimal AI for the standard 4 × 4 Collapsi ruleset.
+PerfectAIPlayer — a game‑theoretic optimal AI for Collapsi on any board size.
 
 This implementation uses a memoised minimax/retrograde analysis on an efficient
 bit‑encoded state representation:
     state  = (collapsed_mask, p0_idx, p1_idx, player_to_move)
 where
-    collapsed_mask  –  16‑bit int, bit i == 1 ⟺ card i is collapsed
+    collapsed_mask  –  (size*size)‑bit int, bit i == 1 ⟺ card i is collapsed
     pX_idx          –  square index (row*size+col) of player X (always on a live card)
-The static card *values* never change, so they are stored once per instance.
+The static card *values* never change, so they are stored once per instance,
+together with the precomputed walks leaving each cell (collapsi_movetable).
+Only the landing cell of a move affects the next state, so the search tries
+one path per reachable destination rather than every path.  Moves are tried
+in the order given by ``ordering`` (collapsi_ordering); by default landing
+on the highest card first, which prunes about 30% of a cold solve.
+
+The default engine walks the game tree with an explicit work stack, making
+and unmaking moves on that state in place, so search depth is not bounded by
+Python's recursion limit.  The original recursive engine is kept for
+comparison (``engine="recursive"``).  ``engine="retrograde"`` instead solves
+every state of the deal up front with NumPy (retrograde_solver), after which
+each move is a table lookup; NumPy is only imported when it is selected.
+
+``engine="distance"`` also plays the *quickest* win and, when lost, the
+*longest* defence.  Every other engine stops at the first winning move and
+plays the first legal move when lost.  It caches a signed plies-to-end
+instead of ±1; see _solve_distance for the encoding and its cost.
+
+Given a Tablebase (collapsi_tablebase), solved deals persist across runs: the
+player answers from it when it can and writes each deal it solves back.
+Given an OpeningBook (collapsi_book), the first move of each player is a
+lookup and the deal is solved on a background thread while the game goes on;
+the next get_move waits for that solve if it is still running.
+
+Solved states are memoised in a SolverCache (collapsi_cache), unbounded by
+default.  Pass ``cache=SolverCache(max_entries=...)`` to cap its memory; the
+cache is cleared whenever the player meets a new deal.
+
+With ``profile=True`` every solve also records a SearchStats
+(collapsi_profiling), kept as last_solve_stats.
+
+A search can be stopped from another thread with cancel_move(); the
+minimax engines publish their counters every PROGRESS_NODES nodes, so
+search_stats() also shows the progress of a search still running.
+
+Players given a SolverService share one solver per deal instead: in
+Perfect-vs-Perfect play the second seat finds the first seat's work in the
+cache, and the solver is dropped once no player is still on that deal.
 
 Depth ≤ 31 moves and a reachable state‑space under ~3 M makes a full search
-practical (<1 s startup on modern hardware; subsequent queries are O(1)).
+practical on the standard 4 × 4 board (<1 s startup on modern hardware;
+subsequent queries are O(1)).  Larger boards only differ in cost: a cold
+5 × 5 solve expands around a million states (seconds) and 6 × 6 is out of
+reach (see benchmark.py --scaling-deals).  The retrograde engine is 4 × 4
+only; a tablebase serves the board size matching its key_size.
 The AI *never* moves from a winning to a losing position.  If started in a
-mathematically lost state it plays any legal move (delaying defeat as long
-as possible).
+mathematically lost state it plays the first legal move, or with
+``engine="distance"`` the one delaying defeat as long as possible.
 """
 
-from typing import List, Optional, Tuple, Dict
-from collapsi_core import Position, Game
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple, Dict
+import threading
+import time
+from collapsi_book import BookEntry, OpeningBook
+from collapsi_cache import SolverCache
+from collapsi_core import CardValue, Position, Game
+from collapsi_profiling import SearchStats
+from collapsi_movetable import Walk, walk_table
+from collapsi_ordering import ORDERINGS, fewest_replies_first, order_walks
+from collapsi_symmetry import (Permutation, canonical_deal_transform, grid_automorphisms,
+                               invert, mask_permuter)
+from collapsi_tablebase import DealEntry, Tablebase, TablebaseFull, state_code
 from player_interface import Player
 
+# nodes between progress updates / cancellation checks of a running search
+PROGRESS_NODES = 4096
+# a background solve sleeps this long (seconds) before searching, so the
+# get_move that started it returns without queueing for the GIL behind it
+BACKGROUND_DELAY = 0.001
+# the distance engine caches ±(DISTANCE_OFFSET + plies to the end): never ±1,
+# which marks a state whose outcome alone is known, and the sign is still
+# the outcome (a stuck player is 0 plies from losing)
+DISTANCE_OFFSET = 2
+
+
+class SearchCancelled(Exception):
+    pass
+
 
 class PerfectAIPlayer(Player):
     """Deterministic, perfect‑play AI."""
 
     # ---- public API -----------------------------------------------------
 
-    def __init__(self, player_id: int, name: str | None = None):
+    ENGINES = ("iterative", "recursive", "retrograde", "distance")
+
+    def __init__(
+        self,
+        player_id: int,
+        name: str | None = None,
+        use_symmetry: bool = True,
+        engine: str = "iterative",
+        tablebase: Tablebase | None = None,
+        store_states: bool = False,
+        cache: SolverCache | None = None,
+        service: "SolverService | None" = None,
+        profile: bool | Callable[[SearchStats], None] = False,
+        ordering: str = "value",
+        book: OpeningBook | None = None,
+    ):
         super().__init__(player_id, name or f"Perfect AI {player_id + 1}")
+        if engine not in self.ENGINES:
+            raise ValueError(f"unknown engine {engine!r}, expected one of {self.ENGINES}")
+        if ordering not in ORDERINGS:
+            raise ValueError(f"unknown move ordering {ordering!r}, expected one of {ORDERINGS}")
+        self._engine = engine
+        self._ordering = ordering
         # lazily filled on first get_move call
         self._initialised = False
         self._size: int = 4
         self._values: Tuple[int, ...] = ()  # card numeric values, len == size*size
-        self._nbrs: List[Tuple[int, int, int, int]] = []  # up, down, left, right indices for each cell
-        self._cache: Dict[Tuple[int, int, int, int], Tuple[int, Optional[Tuple[int, ...]]]] = {}
+        self._walks: List[Tuple[Walk, ...]] = []  # every walk off each cell for that cell's value
+        self._cache = cache if cache is not None else SolverCache()
+        self._retrograde = None  # RetrogradeSolver for the deal, built on first solve
+        # automorphisms of the value grid as (perm, inverse, mask permuter);
+        # states are cached under the smallest key among their images
+        self._use_symmetry = use_symmetry
+        self._symmetries: List[Tuple[Permutation, Permutation, Callable[[int], int]]] = []
+        # search statistics since the last (re)initialisation
+        self._lookups = 0
+        self._hits = 0
+        self._nodes = 0
+        # set by cancel_move, checked by the minimax engines
+        self._cancelled = False
+        # opt-in per-solve instrumentation; a callable also gets every record
+        self._profile = profile
+        self.last_solve_stats: Optional[SearchStats] = None
+        # persistent results; the deal is recorded under its canonical key,
+        # _deal_perm maps this deal's cells onto the canonical ones
+        self._tablebase = tablebase
+        self._store_states = store_states
+        self._root: Optional[Tuple[int, int, int, int]] = None
+        self._deal_key: Optional[bytes] = None
+        self._deal_perm: Permutation = ()
+        self._deal_inverse: Permutation = ()
+        self._deal_mask: Optional[Callable[[int], int]] = None
+        self._deal_entry: Optional[DealEntry] = None
+        # first moves of the deal, and the solve started after answering one
+        self._book = book
+        self._book_entry: Optional[BookEntry] = None
+        self._background: Optional[threading.Thread] = None
+        # with a service, the shared solver for the current deal; the
+        # service's settings replace engine, tablebase and cache above
+        self._service = service
+        self._shared: Optional[PerfectAIPlayer] = None
+        # the solver a get_move is searching on, so cancel_move can reach it
+        self._searching: Optional[PerfectAIPlayer] = None
+        self._cancel_lock = threading.Lock()
 
     # ---- Player interface ----------------------------------------------
 
@@ -49,13 +172,46 @@ class PerfectAIPlayer(Player):
         if not valid_moves:
             return None  # no legal move — shouldn’t be called in this case
 
-        if not self._initialised:
+        self._cancelled = False
+        if self._service is not None:
+            return self._shared_move(game, valid_moves)
+        return self._search_move(game, valid_moves)
+
+    def _shared_move(self, game: Game, valid_moves: List[List[Position]]) -> Optional[List[Position]]:
+        """get_move on the service's solver for the deal.
+
+        Until the search returns, cancel_move reaches that solver, even if
+        the deal has been released meanwhile; a cancel that came in while it
+        was being acquired is passed on to it.
+        """
+        solver = self._shared_solver(game)
+        with self._cancel_lock:
+            self._searching = solver
+            solver._cancelled = self._cancelled
+        try:
+            return solver._search_move(game, valid_moves)
+        finally:
+            with self._cancel_lock:
+                self._searching = None
+
+    def _search_move(self, game: Game, valid_moves: List[List[Position]]) -> Optional[List[Position]]:
+        """get_move for this solver; a pending cancel_move is left in place."""
+        self._finish_background()
+        if not self._initialised or self._deal_values(game) != self._values:
             self._initialise_from_game(game)
 
         collapsed_mask, p0_idx, p1_idx = self._encode_board(game)
         current = game.current_player
 
-        outcome, best = self._solve(collapsed_mask, p0_idx, p1_idx, current)
+        known = None
+        if self._book_entry is not None:
+            known = self._book_move(collapsed_mask, p0_idx, p1_idx, current)
+        if known is None:
+            outcome, best = self._solve_with_tablebase(collapsed_mask, p0_idx, p1_idx, current)
+        else:
+            outcome, best = known
+            # answer now and search the deal while the opponent moves
+            self._solve_in_background(collapsed_mask, p0_idx, p1_idx, current)
 
         # best can be None only if the position is already lost.
         if best is None:
@@ -63,44 +219,153 @@ class PerfectAIPlayer(Player):
 
         return [self._idx_to_pos(i) for i in best]
 
+    def cancel_move(self):
+        """Make a get_move running on another thread raise SearchCancelled.
+
+        Every state solved so far stays cached.  The retrograde engine cannot
+        be interrupted while it builds its table.  A background solve started
+        after a book move is stopped as well.
+        """
+        with self._cancel_lock:
+            self._cancelled = True
+            if self._searching is not None:
+                self._searching._cancelled = True
+
+    def on_game_start(self, game: Game):
+        if self._service is not None:
+            self.release_deal()
+        else:
+            self.reset_cache()
+
+    def on_game_end(self, game: Game, winner: int):
+        self.release_deal()
+
+    def release_deal(self):
+        """Give the shared solver for the current deal back to the service."""
+        if self._shared is not None:
+            self._service.release(self._shared)
+            self._shared = None
+
+    def search_stats(self) -> Dict[str, float]:
+        """Counters for the current deal: nodes expanded, cache lookups/hits and size.
+
+        The cache's own counters (hits, misses, evictions, approximate bytes)
+        run across deals until reset_cache; see cache_stats.
+        """
+        if self._shared is not None:
+            return self._shared.search_stats()
+        stats = {
+            "automorphisms": len(self._symmetries),
+            "nodes": self._nodes,
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "hit_rate": self._hits / self._lookups if self._lookups else 0.0,
+            "cache_entries": len(self._cache),
+            "cache_evictions": self._cache.evictions,
+            "cache_bytes": self._cache.approx_bytes,
+        }
+        if self.last_solve_stats is not None:
+            stats["last_solve"] = self.last_solve_stats.summary()
+        return stats
+
+    def cache_stats(self) -> Dict[str, float]:
+        if self._shared is not None:
+            return self._shared.cache_stats()
+        return self._cache.stats()
+
+    def clear_cache(self):
+        """Drop every memoised state; the next query searches from scratch."""
+        self._stop_background()
+        self._cache.clear()
+        self._retrograde = None
+
+    def reset_cache(self):
+        """clear_cache, zero the cache counters and forget the deal."""
+        self._stop_background()
+        self._cache.reset()
+        self._retrograde = None
+        self._initialised = False
+
     # ---- internal helpers ----------------------------------------------
 
+    @staticmethod
+    def _deal_values(game: Game) -> Tuple[int, ...]:
+        s = game.board.size
+        return tuple(game.board.grid[r][c].value.value for r in range(s) for c in range(s))
+
     def _initialise_from_game(self, game: Game):
-        self._size = game.board.size
-        s = self._size
+        self._initialise_from_values(self._deal_values(game), game.board.size)
 
-        # pre‑compute neighbours with wrap‑around
-        self._nbrs = [()
-                      for _ in range(s * s)]
-        for r in range(s):
-            for c in range(s):
-                i = r * s + c
-                up = ((r - 1) % s) * s + c
-                dn = ((r + 1) % s) * s + c
-                lf = r * s + ((c - 1) % s)
-                rt = r * s + ((c + 1) % s)
-                self._nbrs[i] = (up, dn, lf, rt)
+    def _shared_solver(self, game: Game) -> "PerfectAIPlayer":
+        values = self._deal_values(game)
+        if self._shared is None or self._shared._values != values:
+            self.release_deal()
+            self._shared = self._service.acquire(values, game.board.size)
+        return self._shared
+
+    def _initialise_from_values(
+        self,
+        values: Sequence[int],
+        size: int = 4,
+        root_pawns: Optional[Tuple[int, int]] = None,
+    ):
+        """Set up the solver for a deal given as row-major card values.
+
+        Any previously solved states belong to another deal, so the cache is
+        cleared.  *root_pawns* are the starting cells of the pawns; by default
+        they are the first two Jacks in row-major order, as a normal deal
+        places them.  The tablebase and book are only used when the root is known.
+        """
+        self._stop_background()
+        self._size = size
+        s = self._size
 
         # static card values
-        values: list[int] = []
-        for r in range(s):
-            for c in range(s):
-                card = game.board.grid[r][c]
-                values.append(card.value.value)
         self._values = tuple(values)
 
+        # a cell's card never changes, so neither do the walks leaving it
+        self._walks = order_walks([walk_table(s, v)[i] for i, v in enumerate(self._values)],
+                                  self._values, self._ordering)
+        if self._ordering == "mobility":
+            self._generate_moves = fewest_replies_first(self._walks)
+        self._cache.clear()
+        self._retrograde = None
+
+        # symmetries of this particular deal (usually just the identity)
+        self._symmetries = []
+        if self._use_symmetry:
+            for perm in grid_automorphisms(self._values, s):
+                self._symmetries.append((perm, invert(perm), mask_permuter(perm)))
+        self._lookups = self._hits = self._nodes = 0
+
+        if root_pawns is None:
+            jacks = [i for i, v in enumerate(self._values) if v == CardValue.JACK.value]
+            root_pawns = (jacks[0], jacks[1]) if len(jacks) >= 2 else None
+        self._root = (0, *root_pawns, 0) if root_pawns else None
+        self._deal_key = None
+        self._deal_entry = None
+        self._book_entry = None
+        # the tablebase and book only know who wins, not how fast
+        use_tablebase = self._tablebase is not None and self._tablebase.key_size == s * s
+        use_book = self._book is not None and self._book.size == s
+        if (use_tablebase or use_book) and self._root is not None and self._engine != "distance":
+            deal_key, self._deal_perm = canonical_deal_transform(self._values, *root_pawns, s)
+            self._deal_inverse = invert(self._deal_perm)
+            if use_tablebase:
+                self._deal_key = deal_key
+                self._deal_mask = mask_permuter(self._deal_perm)
+                self._deal_entry = self._tablebase.lookup(deal_key)
+            if use_book:
+                self._book_entry = self._book.lookup(deal_key)
+
         self._initialised = True
 
     # --------------------------------------------------------------------
 
     def _encode_board(self, game: Game) -> Tuple[int, int, int]:
         """Return (collapsed_mask, p0_idx, p1_idx)."""
-        mask = 0
+        mask = game.board.collapsed_mask()
         s = self._size
-        for r in range(s):
-            for c in range(s):
-                if game.board.grid[r][c].is_collapsed:
-                    mask |= 1 << (r * s + c)
         p0 = game.board.player_positions[0]
         p1 = game.board.player_positions[1]
         p0_idx = p0.row * s + p0.col
@@ -113,36 +378,149 @@ class PerfectAIPlayer(Player):
         self,
         collapsed: int,
         start_idx: int,
-        steps: int,
         opponent_idx: int,
     ) -> List[Tuple[int, ...]]:
-        """Enumerate all legal paths of exact length *steps* starting at *start_idx*."""
-        if steps == 0:
-            return []
-
-        res: List[Tuple[int, ...]] = []
-        visited = collapsed | (1 << start_idx)  # mark start as visited
-        path: List[int] = []
-
-        def dfs(cur: int, left: int, vis: int):
-            if left == 0:
-                if cur != start_idx:
-                    res.append(tuple(path))
-                return
-            for nxt in self._nbrs[cur]:
-                if nxt == opponent_idx:
-                    continue
-                if vis & (1 << nxt):  # already visited or collapsed
-                    continue
-                path.append(nxt)
-                dfs(nxt, left - 1, vis | (1 << nxt))
-                path.pop()
-
-        dfs(start_idx, steps, visited)
-        return res
+        """One legal path from *start_idx* to each reachable landing cell."""
+        # inlined collapsi_movetable.reachable_destinations
+        moves = []
+        seen = 1 << opponent_idx
+        for walk_mask, end, path in self._walks[start_idx]:
+            if not walk_mask & collapsed and not seen >> end & 1:
+                seen |= 1 << end
+                moves.append(path)
+        return moves
 
     # --------------------------------------------------------------------
 
+    def _solve_with_tablebase(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """_solve, answered from the tablebase when possible and recorded there after."""
+        if self._deal_key is None:
+            return self._solve(collapsed, p0_idx, p1_idx, current)
+
+        if self._deal_entry is not None:
+            known = self._tablebase_result(collapsed, p0_idx, p1_idx, current)
+            if known is not None:
+                return known
+
+        result = self._solve(collapsed, p0_idx, p1_idx, current)
+        if self._deal_entry is None and not self._tablebase.readonly:
+            self._store_deal()
+        return result
+
+    def _tablebase_result(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Optional[Tuple[int, Optional[Tuple[int, ...]]]]:
+        entry = self._deal_entry
+        if (collapsed, p0_idx, p1_idx, current) == self._root:
+            best = entry.best_path
+            return entry.outcome, best and tuple(self._deal_inverse[i] for i in best)
+
+        value = self._stored_value(collapsed, p0_idx, p1_idx, current)
+        if value is None:
+            return None
+        start_idx = p0_idx if current == 0 else p1_idx
+        opponent_idx = p1_idx if current == 0 else p0_idx
+        moves = self._generate_moves(collapsed, start_idx, opponent_idx)
+        if value == -1:
+            return -1, moves[0] if moves else None
+
+        # a won position: find the move into a stored loss for the opponent
+        new_collapsed = collapsed | (1 << start_idx)
+        for mv in moves:
+            if current == 0:
+                child = (new_collapsed, mv[-1], p1_idx, 1)
+            else:
+                child = (new_collapsed, p0_idx, mv[-1], 0)
+            if self._stored_value(*child) == -1:
+                return 1, mv
+        return None
+
+    def _book_move(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Optional[Tuple[int, Optional[Tuple[int, ...]]]]:
+        """_solve for either player's first move, answered from the opening book."""
+        entry = self._book_entry
+        if (collapsed, p0_idx, p1_idx, current) == self._root:
+            outcome, landing = entry.outcome, entry.best
+            start_idx, opponent_idx = p0_idx, p1_idx
+        elif current == 1 and collapsed == 1 << self._root[1] and p1_idx == self._root[2]:
+            reply = entry.replies.get(self._deal_perm[p0_idx])
+            if reply is None:
+                return None
+            outcome, landing = reply
+            start_idx, opponent_idx = p1_idx, p0_idx
+        else:
+            return None
+
+        if landing is None:
+            return outcome, None
+        end = self._deal_inverse[landing]
+        for mv in self._generate_moves(collapsed, start_idx, opponent_idx):
+            if mv[-1] == end:
+                return outcome, mv
+        return None
+
+    def _solve_in_background(self, collapsed: int, p0_idx: int, p1_idx: int, current: int):
+        """Start solving a state on a thread; its results land in the cache."""
+
+        def solve():
+            time.sleep(BACKGROUND_DELAY)
+            try:
+                self._solve_with_tablebase(collapsed, p0_idx, p1_idx, current)
+            except SearchCancelled:
+                pass
+
+        self._background = threading.Thread(target=solve, name="collapsi-solve", daemon=True)
+        self._background.start()
+
+    def _finish_background(self):
+        """Wait for a background solve, if any; the solver is not searched from two threads."""
+        if self._background is not None:
+            self._background.join()
+            self._background = None
+
+    def _stop_background(self):
+        if self._background is not None:
+            cancelled = self._cancelled  # keep a cancel_move meant for the caller's search
+            self._cancelled = True
+            self._finish_background()
+            self._cancelled = cancelled
+
+    def _stored_value(self, collapsed: int, p0_idx: int, p1_idx: int, current: int) -> Optional[int]:
+        perm = self._deal_perm
+        code = state_code(self._deal_mask(collapsed), perm[p0_idx], perm[p1_idx], current, len(perm))
+        return self._tablebase.state_value(self._deal_entry, code)
+
+    def _store_deal(self):
+        """Write this deal's root result (and optionally every cached state) to the tablebase."""
+        outcome, best = self._solve(*self._root)
+        perm = self._deal_perm
+        states = None
+        if self._store_states:
+            states = {
+                state_code(self._deal_mask(collapsed), perm[p0_idx], perm[p1_idx], current, len(perm)): value
+                for (collapsed, p0_idx, p1_idx, current), (value, _) in self._cache.items()
+            }
+        try:
+            self._tablebase.store(self._deal_key, outcome, best and tuple(perm[i] for i in best), states)
+        except TablebaseFull:
+            return
+        self._deal_entry = self._tablebase.lookup(self._deal_key)
+
     def _solve(
         self,
         collapsed: int,
@@ -152,42 +530,425 @@ class PerfectAIPlayer(Player):
     ) -> Tuple[int, Optional[Tuple[int, ...]]]:
         """Minimax with memoisation.
 
+        Returns (value, best_path) where value ∈ {+1 (win), −1 (loss)} for the
+        *current* player.  best_path is None iff value == −1.
+        """
+        if self._profile:
+            return self._solve_profiled(collapsed, p0_idx, p1_idx, current)
+        return self._solve_engine(collapsed, p0_idx, p1_idx, current)
+
+    def _solve_profiled(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """_solve_engine with move generation timed and a SearchStats recorded."""
+        stats = SearchStats()
+        generate = self._generate_moves
+        perf_counter = time.perf_counter
+        branching = stats.branching
+        root_depth = bin(collapsed).count("1")
+
+        def generate_moves(collapsed: int, start_idx: int, opponent_idx: int) -> List[Tuple[int, ...]]:
+            start_time = perf_counter()
+            moves = generate(collapsed, start_idx, opponent_idx)
+            stats.movegen_seconds += perf_counter() - start_time
+            branching[len(moves)] += 1
+            depth = bin(collapsed).count("1") - root_depth
+            if depth > stats.max_depth:
+                stats.max_depth = depth
+            return moves
+
+        nodes, lookups, hits = self._nodes, self._lookups, self._hits
+        own_generator = vars(self).get("_generate_moves")  # set by some orderings
+        self._generate_moves = generate_moves  # shadows the generator for this solve
+        start_time = perf_counter()
+        try:
+            return self._solve_engine(collapsed, p0_idx, p1_idx, current)
+        finally:
+            stats.seconds = perf_counter() - start_time
+            if own_generator is None:
+                del self._generate_moves
+            else:
+                self._generate_moves = own_generator
+            stats.nodes = self._nodes - nodes
+            stats.lookups = self._lookups - lookups
+            stats.hits = self._hits - hits
+            self.last_solve_stats = stats
+            if callable(self._profile):
+                self._profile(stats)
+
+    def _solve_engine(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        if self._engine == "retrograde":
+            if self._retrograde is None:
+                from retrograde_solver import RetrogradeSolver
+
+                self._retrograde = RetrogradeSolver(self._values, self._size)
+            return self._retrograde.solve(collapsed, p0_idx, p1_idx, current)
+
+        lookups, hits = self._lookups, self._hits
+        try:
+            if self._engine == "recursive":
+                return self._solve_recursive(collapsed, p0_idx, p1_idx, current)
+            if self._engine == "distance":
+                plies, best = self._solve_distance(collapsed, p0_idx, p1_idx, current)
+                return (1 if plies & 1 else -1), best
+            return self._solve_iterative(collapsed, p0_idx, p1_idx, current)
+        finally:
+            self._cache.record(self._lookups - lookups, self._hits - hits)
+
+    def _solve_iterative(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """Explicit-stack version of _solve_recursive with make/unmake moves.
+
+        Each stack frame is [key, perm, moves, move_index, start_idx] for a
+        state whose children are being searched.  The state itself lives in
+        local variables: making a move collapses the start card, moves the
+        pawn and flips the side to move; unmaking reverses all three.
+        """
+        cache_get = self._cache.get
+        cache_put = self._cache.put
+        generate_moves = self._generate_moves
+        symmetric = bool(self._symmetries)
+        pawns = [p0_idx, p1_idx]
+        stack: List[list] = []
+        lookups = hits = nodes = 0
+
+        while True:
+            # ---- expand the state on the board
+            key = (collapsed, pawns[0], pawns[1], current)
+            perm = None
+            if symmetric:
+                key, perm, inverse = self._canonical_key(key)
+
+            lookups += 1
+            cached = cache_get(key)
+            if cached is not None:
+                hits += 1
+                if perm is not None and cached[1] is not None:
+                    result = (cached[0], tuple(inverse[i] for i in cached[1]))
+                else:
+                    result = cached
+            else:
+                nodes += 1
+                if nodes == PROGRESS_NODES:
+                    # publish progress, then see whether to stop
+                    self._lookups += lookups
+                    self._hits += hits
+                    self._nodes += nodes
+                    lookups = hits = nodes = 0
+                    if self._cancelled:
+                        raise SearchCancelled
+                start_idx = pawns[current]
+                moves = generate_moves(collapsed, start_idx, pawns[1 - current])
+                if moves:
+                    stack.append([key, perm, moves, 0, start_idx])
+                    collapsed |= 1 << start_idx
+                    pawns[current] = moves[0][-1]
+                    current ^= 1
+                    continue
+                result = (-1, None)  # no legal move => lose immediately
+                cache_put(key, result)
+
+            # ---- hand the result up until some frame has a move left to try
+            while stack:
+                frame = stack[-1]
+                key, perm, moves, i, start_idx = frame
+                mover = current ^ 1
+
+                if result[0] < 0:  # opponent loses ⇒ we win
+                    result = (1, moves[i])
+                elif i + 1 < len(moves):
+                    # siblings differ only in where the pawn lands
+                    frame[3] = i + 1
+                    pawns[mover] = moves[i + 1][-1]
+                    break
+                else:
+                    # all moves lead to opponent’s win ⇒ we lose; pick first to prolong
+                    result = (-1, moves[0])
+
+                # unmake the move and finish this frame
+                current = mover
+                pawns[mover] = start_idx
+                collapsed ^= 1 << start_idx
+
+                # the cache holds paths in canonical coordinates
+                if perm is not None:
+                    cache_put(key, (result[0], tuple(perm[j] for j in result[1])))
+                else:
+                    cache_put(key, result)
+                stack.pop()
+            else:
+                self._lookups += lookups
+                self._hits += hits
+                self._nodes += nodes
+                return result
+
+    def _solve_recursive(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """Minimax with memoisation, one Python call per state.
+
         Returns (value, best_path) where value ∈ {+1 (win), −1 (loss)} for the
         *current* player.  best_path is None iff value == −1.
         """
         key = (collapsed, p0_idx, p1_idx, current)
-        if key in self._cache:
-            return self._cache[key]
+        perm = None
+        if self._symmetries:
+            key, perm, inverse = self._canonical_key(key)
+
+        self._lookups += 1
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._hits += 1
+            if perm is not None and cached[1] is not None:
+                return cached[0], tuple(inverse[i] for i in cached[1])
+            return cached
+        self._nodes += 1
+        if self._cancelled:
+            raise SearchCancelled
 
         start_idx = p0_idx if current == 0 else p1_idx
         opponent_idx = p1_idx if current == 0 else p0_idx
-        steps = self._values[start_idx]
 
-        moves = self._generate_moves(collapsed, start_idx, steps, opponent_idx)
+        moves = self._generate_moves(collapsed, start_idx, opponent_idx)
         if not moves:  # no legal move => lose immediately
             result = (-1, None)
-            self._cache[key] = result
-            return result
+        else:
+            # unless a winning move turns up below: we lose; pick first to prolong
+            result = (-1, moves[0])
 
         # try to find a winning move
         new_collapsed = collapsed | (1 << start_idx)
         for mv in moves:
             final_idx = mv[-1]
             if current == 0:
-                child_val, _ = self._solve(new_collapsed, final_idx, p1_idx, 1)
+                child_val, _ = self._solve_recursive(new_collapsed, final_idx, p1_idx, 1)
             else:
-                child_val, _ = self._solve(new_collapsed, p0_idx, final_idx, 0)
-            if child_val == -1:  # opponent loses ⇒ we win
+                child_val, _ = self._solve_recursive(new_collapsed, p0_idx, final_idx, 0)
+            if child_val < 0:  # opponent loses ⇒ we win
                 result = (1, mv)
-                self._cache[key] = result
-                return result
+                break
 
-        # all moves lead to opponent’s win ⇒ we lose; pick first to prolong
-        result = (-1, moves[0])
-        self._cache[key] = result
+        # the cache holds paths in canonical coordinates
+        if perm is not None and result[1] is not None:
+            self._cache.put(key, (result[0], tuple(perm[i] for i in result[1])))
+        else:
+            self._cache.put(key, result)
         return result
 
+    def _solve_distance(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """Minimax on plies-to-end: win as fast as possible, lose as slowly as possible.
+
+        Returns (plies, best_path): the game ends *plies* moves from now with
+        perfect play, and the player who moves last wins, so the player to
+        move wins iff plies is odd.
+
+        Distances share the boolean engine's cache entries: a state whose
+        distance is known holds ±(DISTANCE_OFFSET + plies) in the value
+        slot, signed like the ±1 of a state whose distance is not, so the
+        boolean search, which only tests the sign, reads either unchanged.
+        It answers who wins each child first, so a won state only measures
+        the moves that keep the win; a lost state must still measure every
+        reply.  On the seeded benchmark deals a
+        cold root solve still expands ~5.7x the nodes, keeps ~4.6x the cache
+        entries and takes ~5x the time of the boolean engine.
+        """
+        key = (collapsed, p0_idx, p1_idx, current)
+        perm = None
+        if self._symmetries:
+            key, perm, inverse = self._canonical_key(key)
+
+        self._lookups += 1
+        cached = self._cache.get(key)
+        if cached is not None and not -1 <= cached[0] <= 1:
+            self._hits += 1
+            plies = abs(cached[0]) - DISTANCE_OFFSET
+            if perm is not None and cached[1] is not None:
+                return plies, tuple(inverse[i] for i in cached[1])
+            return plies, cached[1]
+        self._nodes += 1
+        if self._cancelled:
+            raise SearchCancelled
+
+        value = (cached if cached is not None else
+                 self._solve_iterative(collapsed, p0_idx, p1_idx, current))[0]
+        start_idx = p0_idx if current == 0 else p1_idx
+        opponent_idx = p1_idx if current == 0 else p0_idx
+
+        best_plies, best_path = 0, None  # no legal move => lose immediately
+        new_collapsed = collapsed | (1 << start_idx)
+        for mv in self._generate_moves(collapsed, start_idx, opponent_idx):
+            if current == 0:
+                child = (new_collapsed, mv[-1], p1_idx, 1)
+            else:
+                child = (new_collapsed, p0_idx, mv[-1], 0)
+            if value > 0:
+                # only moves into a lost position keep the win
+                if self._solve_iterative(*child)[0] > 0:
+                    continue
+                plies = self._solve_distance(*child)[0] + 1
+                if best_path is None or plies < best_plies:
+                    best_plies, best_path = plies, mv
+                    if plies == 1:
+                        break  # the opponent is stuck; nothing is quicker
+            else:
+                plies = self._solve_distance(*child)[0] + 1
+                if best_path is None or plies > best_plies:
+                    best_plies, best_path = plies, mv
+
+        distance = DISTANCE_OFFSET + best_plies
+        # the cache holds paths in canonical coordinates
+        if perm is not None and best_path is not None:
+            self._cache.put(key, (distance if value > 0 else -distance, tuple(perm[i] for i in best_path)))
+        else:
+            self._cache.put(key, (distance if value > 0 else -distance, best_path))
+        return best_plies, best_path
+
+    def _canonical_key(
+        self,
+        key: Tuple[int, int, int, int],
+    ) -> Tuple[Tuple[int, int, int, int], Optional[Permutation], Optional[Permutation]]:
+        """Smallest image of *key* under the deal's automorphisms.
+
+        Returns (canonical_key, perm, inverse) where perm maps the state onto
+        the canonical one; perm is None when the state is already canonical.
+        """
+        collapsed, p0_idx, p1_idx, current = key
+        best, best_perm, best_inverse = key, None, None
+        for perm, inverse, permute_mask in self._symmetries:
+            image = (permute_mask(collapsed), perm[p0_idx], perm[p1_idx], current)
+            if image < best:
+                best, best_perm, best_inverse = image, perm, inverse
+        return best, best_perm, best_inverse
+
     # --------------------------------------------------------------------
 
     def _idx_to_pos(self, idx: int) -> Position:
         return Position(idx // self._size, idx % self._size)
+
+
+class SolverService:
+    """Per-deal solvers shared by every PerfectAIPlayer (and batch tool) using the service.
+
+    acquire() hands out the solver for a deal, creating and initialising it
+    on first use, and counts a reference; release() drops one.  A deal no one
+    refers to any more is freed, or, with *retain*, kept among the *retain*
+    most recently released deals in case it comes back.  Solvers are
+    PerfectAIPlayer instances built from the service's settings.
+
+    The bookkeeping is thread-safe; a solver itself must not be searched
+    from two threads at once.
+    """
+
+    def __init__(
+        self,
+        engine: str = "iterative",
+        use_symmetry: bool = True,
+        tablebase: Tablebase | None = None,
+        store_states: bool = False,
+        cache_entries: int | None = None,
+        retain: int = 0,
+        profile: bool | Callable[[SearchStats], None] = False,
+        ordering: str = "value",
+        book: OpeningBook | None = None,
+    ):
+        self._options = dict(engine=engine, use_symmetry=use_symmetry, tablebase=tablebase,
+                             store_states=store_states, profile=profile, ordering=ordering,
+                             book=book)
+        self._cache_entries = cache_entries
+        self._retain = retain
+        self._lock = threading.Lock()
+        # (size, values) -> [solver, references]
+        self._active: Dict[Tuple[int, Tuple[int, ...]], list] = {}
+        self._released: "OrderedDict[Tuple[int, Tuple[int, ...]], PerfectAIPlayer]" = OrderedDict()
+        self._acquires = 0
+        self._reuses = 0
+
+    def acquire(self, values: Sequence[int], size: int = 4) -> PerfectAIPlayer:
+        """The solver for a deal given as row-major card values; pair with release()."""
+        key = (size, tuple(values))
+        with self._lock:
+            self._acquires += 1
+            slot = self._active.get(key)
+            if slot is None:
+                solver = self._released.pop(key, None)
+                if solver is None:
+                    solver = PerfectAIPlayer(0, cache=SolverCache(self._cache_entries), **self._options)
+                    solver._initialise_from_values(key[1], size)
+                else:
+                    self._reuses += 1
+                slot = self._active[key] = [solver, 0]
+            else:
+                self._reuses += 1
+            slot[1] += 1
+            return slot[0]
+
+    def release(self, solver: PerfectAIPlayer):
+        key = (solver._size, solver._values)
+        with self._lock:
+            slot = self._active.get(key)
+            if slot is None or slot[0] is not solver:
+                raise ValueError("solver was not acquired from this service")
+            slot[1] -= 1
+            if slot[1]:
+                return
+            del self._active[key]
+            freed = []
+            if not self._retain:
+                freed.append(solver)
+            else:
+                self._released[key] = solver
+                while len(self._released) > self._retain:
+                    freed.append(self._released.popitem(last=False)[1])
+        # a solve left running after a book move is of no use to anyone now
+        for dropped in freed:
+            dropped._stop_background()
+
+    def __len__(self) -> int:
+        """Number of deals held, in use or retained."""
+        return len(self._active) + len(self._released)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "active_deals": len(self._active),
+                "references": sum(slot[1] for slot in self._active.values()),
+                "retained_deals": len(self._released),
+                "acquires": self._acquires,
+                "reuses": self._reuses,
+            }
+
+
+_shared_service: Optional[SolverService] = None
+
+
+def shared_service() -> SolverService:
+    """The process-wide default SolverService, created on first use."""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = SolverService()
+    return _shared_service
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Callable
+from typing import Dict, List, Optional, Callable
 from collapsi_core import Position, Game
 
 
@@ -17,6 +17,14 @@ class Player(ABC):
     
     def on_game_end(self, game: Game, winner: int):
         pass
+    
+    def cancel_move(self):
+        """Ask a get_move running on another thread to give up; optional."""
+        pass
+    
+    def search_stats(self) -> Dict[str, float]:
+        """Progress counters (e.g. "nodes") of the current or last search; optional."""
+        return {}
 
 
 class HumanPlayer(Player):
@@ -0,0 +1,102 @@
+"""
+Vectorised retrograde analysis of a whole Collapsi deal (requires NumPy).
+
+For a fixed deal a position is (collapsed_mask, mover_idx, other_idx): the
+rules are the same for both players, so which player is to move does not
+matter, only where the two pawns stand.  That is 2**cells * cells * cells
+positions, 16M on the 4x4 board, stored as one bool array ``won`` indexed
+[collapsed, mover, other].
+
+Every move collapses the mover's start card, so a child always has one more
+collapsed card than its parent.  Masks are therefore solved in layers of
+decreasing popcount, each layer from the one above it, and within a layer
+all masks, and all opponent cells, are handled at once with NumPy.  A
+position is won iff some move leads to a position that is lost for the
+opponent; positions with no move are lost.  Entries for impossible
+positions (a pawn on a collapsed card, both pawns on one cell) are
+meaningless and never read.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from collapsi_movetable import reachable_destinations, walk_table
+
+# 2**cells * cells**2 bytes of table: 16 MB for 4x4, 21 GB for 5x5
+MAX_CELLS = 16
+
+
+class RetrogradeSolver:
+    def __init__(self, values: Sequence[int], size: int = 4):
+        cells = size * size
+        if cells > MAX_CELLS:
+            raise ValueError(f"retrograde analysis needs 2**{cells} masks; boards above "
+                             f"{MAX_CELLS} cells are too large")
+        self.size = size
+        self.values = tuple(values)
+        self._walks = [walk_table(size, v)[i] for i, v in enumerate(self.values)]
+        self.won = self._solve_all()
+
+    def _solve_all(self) -> np.ndarray:
+        cells = self.size * self.size
+        masks = np.arange(1 << cells, dtype=np.int64)
+        popcount = np.zeros(1 << cells, dtype=np.int8)
+        for bit in range(cells):
+            popcount += (masks >> bit) & 1
+
+        won = np.zeros((1 << cells, cells, cells), dtype=bool)
+
+        # landing cell -> walk masks that reach it, per start cell
+        by_end: List[Dict[int, List[int]]] = []
+        for walks in self._walks:
+            groups: Dict[int, List[int]] = {}
+            for walk_mask, end, _ in walks:
+                groups.setdefault(end, []).append(walk_mask)
+            by_end.append(groups)
+
+        for layer in range(cells - 1, -1, -1):
+            layer_masks = masks[popcount == layer]
+            for start in range(cells):
+                parents = layer_masks[(layer_masks >> start) & 1 == 0]
+                if not len(parents):
+                    continue
+                children = parents | (1 << start)
+                result = np.zeros((len(parents), cells), dtype=bool)  # [parent, other]
+                for end, walk_masks in by_end[start].items():
+                    open_route = np.zeros(len(parents), dtype=bool)
+                    for walk_mask in walk_masks:
+                        open_route |= (parents & walk_mask) == 0
+                    # the opponent moves next from its own cell, with us on *end*
+                    wins = open_route[:, None] & ~won[children, :, end]
+                    wins[:, end] = False  # cannot land on the opponent
+                    result |= wins
+                won[parents, start, :] = result
+
+        return won
+
+    # ---- queries ---------------------------------------------------------
+
+    def value(self, collapsed: int, p0_idx: int, p1_idx: int, current: int) -> int:
+        """+1 if the player to move wins with perfect play, else -1."""
+        mover, other = (p0_idx, p1_idx) if current == 0 else (p1_idx, p0_idx)
+        return 1 if self.won[collapsed, mover, other] else -1
+
+    def solve(
+        self,
+        collapsed: int,
+        p0_idx: int,
+        p1_idx: int,
+        current: int,
+    ) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """Same (value, best_path) contract as PerfectAIPlayer._solve, by table lookup."""
+        mover, other = (p0_idx, p1_idx) if current == 0 else (p1_idx, p0_idx)
+        moves = reachable_destinations(self._walks[mover], collapsed, other)
+        if not moves:
+            return -1, None
+        if self.won[collapsed, mover, other]:
+            child_collapsed = collapsed | (1 << mover)
+            for _, end, path in moves:
+                if not self.won[child_collapsed, other, end]:
+                    return 1, path
+        return -1, moves[0][2]
@@ -6,59 +6,204 @@ Analyze Collapsi win rates assuming perfect play.
 Uses the PerfectAIPlayer's game tree analysis to determine theoretical outcomes.
 """
 
+from collapsi_cache import SolverCache
 from collapsi_core import Game, Board, Card, CardValue, Position
-from perfect_ai_player import PerfectAIPlayer
+from collapsi_profiling import SearchStats, profile_deal
+from collapsi_symmetry import decode_deal, enumerate_deal_classes
+from collapsi_tablebase import Tablebase
+from perfect_ai_player import PerfectAIPlayer, SolverService
 from collections import defaultdict
-from typing import Dict, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import argparse
+import multiprocessing
 import time
 import random
 
 
-def analyze_win_rates_with_samples(n_samples=1000):
-    """Analyze win rates by sampling random initial board configurations."""
+# ---- parallel plumbing -----------------------------------------------------
+
+# One long-lived solver per process; it is re-initialised (and its cache
+# cleared) for every deal instead of being rebuilt.
+_worker_ai: Optional[PerfectAIPlayer] = None
+# Sampled deals go through a per-process service instead, which keeps the
+# last few solved deals so a deal drawn again is not solved again.
+_worker_service: Optional[SolverService] = None
+RETAINED_DEALS = 16
+
+
+def _init_worker(tablebase_path: Optional[str] = None, cache_entries: Optional[int] = None,
+                 profile: bool = False):
+    global _worker_ai, _worker_service
+    tablebase = Tablebase(tablebase_path) if tablebase_path else None
+    _worker_ai = PerfectAIPlayer(0, tablebase=tablebase, cache=SolverCache(cache_entries),
+                                 profile=profile)
+    _worker_service = SolverService(tablebase=tablebase, cache_entries=cache_entries,
+                                    retain=RETAINED_DEALS, profile=profile)
+
+
+def _chunks(total: int, chunk_size: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+
+
+def _run_chunks(func: Callable, tasks: List, workers: int, total: int, unit: str,
+                tablebase_path: Optional[str] = None, cache_entries: Optional[int] = None,
+                profile: bool = False) -> Iterator:
+    """Run func over tasks, inline or on a process pool, yielding results as they finish.
+
+    Every result must start with the number of deals it covers; progress
+    and throughput are printed as results stream in.
+    """
+    start_time = time.time()
+    last_report = 0.0
+    done = 0
+
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(tablebase_path, cache_entries, profile))
+        results = pool.imap_unordered(func, tasks)
+    else:
+        pool = None
+        _init_worker(tablebase_path, cache_entries, profile)
+        results = map(func, tasks)
+
+    try:
+        for result in results:
+            done += result[0]
+            yield result
+            now = time.time()
+            if now - last_report >= 1.0 or done == total:
+                last_report = now
+                elapsed = now - start_time
+                print(f"Progress: {done}/{total} {unit} analyzed "
+                      f"({done / elapsed if elapsed else 0.0:.1f} deals/sec)...")
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+def sample_game(seed: int, sample_idx: int) -> Game:
+    """The sample_idx-th random deal of a run; depends only on (seed, sample_idx)."""
+    game = Game()
+    game.start_game(random.Random(f"{seed}:{sample_idx}"))
+    return game
+
+
+Profiles = List[Tuple[str, SearchStats]]
+
+
+def _solve_sample_range(task: Tuple[int, int, int]) -> Tuple[int, int, Profiles]:
+    """Solve samples [start, stop) of a seeded run.
+
+    Returns (deals, first-player wins, profiles); profiles holds a
+    ("sample N", SearchStats) pair per searched deal when profiling.
+    """
+    seed, start, stop = task
+    player1_wins = 0
+    profiles = []
+    for sample_idx in range(start, stop):
+        game = sample_game(seed, sample_idx)
+        solver = _worker_service.acquire(PerfectAIPlayer._deal_values(game), game.board.size)
+        try:
+            # Get the game-theoretic outcome using the perfect solver
+            solver.last_solve_stats = None
+            collapsed_mask, p0_idx, p1_idx = solver._encode_board(game)
+            outcome, _ = solver._solve_with_tablebase(collapsed_mask, p0_idx, p1_idx, 0)
+            if solver.last_solve_stats is not None:
+                profiles.append((f"sample {sample_idx}", solver.last_solve_stats))
+        finally:
+            _worker_service.release(solver)
+        if outcome == 1:  # Player 0 wins with perfect play
+            player1_wins += 1
+    return stop - start, player1_wins, profiles
+
+
+def _solve_class_chunk(chunk: List[Tuple[bytes, int]]) -> Tuple[int, int, Profiles]:
+    """Solve one canonical deal per class; return (deals, first-player wins, profiles) weighted by class size."""
+    total = 0
+    player1_wins = 0
+    profiles = []
+    for key, count in chunk:
+        values, p0_idx, p1_idx, size = decode_deal(key)
+        _worker_ai._initialise_from_values(values, size, root_pawns=(p0_idx, p1_idx))
+        _worker_ai.last_solve_stats = None
+        outcome, _ = _worker_ai._solve_with_tablebase(0, p0_idx, p1_idx, 0)
+        if _worker_ai.last_solve_stats is not None:
+            profiles.append((f"class {key.hex()}", _worker_ai.last_solve_stats))
+        total += count
+        if outcome == 1:
+            player1_wins += count
+    return total, player1_wins, profiles
+
+
+def report_profiles(profiles: Profiles, top: int = 10):
+    """Totals over every profiled solve, then the slowest deals."""
+    if not profiles:
+        print("\nNo deals were searched (all answered from the tablebase).")
+        return
+
+    total = SearchStats()
+    for _, stats in profiles:
+        total.nodes += stats.nodes
+        total.lookups += stats.lookups
+        total.hits += stats.hits
+        total.seconds += stats.seconds
+        total.movegen_seconds += stats.movegen_seconds
+        total.max_depth = max(total.max_depth, stats.max_depth)
+        total.branching.update(stats.branching)
+
+    print(f"\nSearch profile over {len(profiles)} solved deals:")
+    print(f"Total: {total.summary()}")
+    expanded = sum(total.branching.values())
+    print("Branching factor histogram: " + ", ".join(
+        f"{b}: {n/expanded*100:.1f}%" for b, n in sorted(total.branching.items())))
+    print(f"\nSlowest {min(top, len(profiles))} deals:")
+    for label, stats in sorted(profiles, key=lambda item: item[1].seconds, reverse=True)[:top]:
+        print(f"{label}: {stats.summary()}")
+
+
+# ---- analyses ---------------------------------------------------------------
+
+
+def analyze_win_rates_with_samples(n_samples=1000, workers=1, seed=None, tablebase_path=None,
+                                   cache_entries=None, profile=False):
+    """Analyze win rates by sampling random initial board configurations.
+
+    Deal i is drawn from its own generator seeded with (seed, i), so the
+    result is the same for any number of workers.
+    """
     
     print("Collapsi Win Rate Analysis (Perfect Play)")
     print("=" * 50)
     
+    if seed is None:
+        seed = random.randrange(2**32)
+    
     # Statistics
     total_games = 0
     player1_wins = 0
     player2_wins = 0
     
-    print(f"Analyzing {n_samples} random starting configurations...")
+    print(f"Analyzing {n_samples} random starting configurations (seed {seed}, {workers} worker(s))...")
     print(f"This may take a few moments...\n")
     
     start_time = time.time()
     
-    for sample_idx in range(n_samples):
-        if sample_idx % 100 == 0:
-            print(f"Progress: {sample_idx}/{n_samples} configurations analyzed...")
-        
-        # Create a game with this configuration
-        game = Game()
-        game.start_game()
-        
-        perfect_ai = PerfectAIPlayer(0)
-        perfect_ai._initialise_from_game(game)
-        
-        # Get the game-theoretic outcome using the perfect solver
-        collapsed_mask, p0_idx, p1_idx = perfect_ai._encode_board(game)
-        outcome, _ = perfect_ai._solve(collapsed_mask, p0_idx, p1_idx, 0)
-        
-        total_games += 1
-        
-        # Track winner
-        if outcome == 1:  # Player 0 wins with perfect play
-            player1_wins += 1
-            winner = 0
-        else:  # Player 1 wins with perfect play
-            player2_wins += 1
-            winner = 1
+    chunk_size = max(1, min(100, n_samples // (workers * 8)))
+    tasks = [(seed, start, stop) for start, stop in _chunks(n_samples, chunk_size)]
+    profiles = []
+    for deals, wins, chunk_profiles in _run_chunks(_solve_sample_range, tasks, workers, n_samples,
+                                                   "configurations", tablebase_path, cache_entries,
+                                                   profile):
+        profiles.extend(chunk_profiles)
+        total_games += deals
+        player1_wins += wins
+        player2_wins += deals - wins
     
     end_time = time.time()
     
     # Print results
-    print(f"\nAnalysis complete in {end_time - start_time:.2f} seconds")
+    print(f"\nAnalysis complete in {end_time - start_time:.2f} seconds "
+          f"({total_games / (end_time - start_time):.1f} deals/sec)")
     print("=" * 50)
     
     print(f"\nOverall Statistics:")
@@ -69,8 +214,132 @@ def analyze_win_rates_with_samples(n_samples=1000):
     print(f"\nFirst-Player Advantage: {(player1_wins/total_games - 0.5)*100:+.1f}%")
     
     print(f"\nNOTE: This analysis is based on {n_samples} randomly sampled board configurations.")
+    if profile:
+        report_profiles(profiles)
+
+
+def analyze_win_rates_exhaustive(size=4, workers=1, tablebase_path=None, cache_entries=None,
+                                 profile=False):
+    """Compute exact win rates by solving one deal from every symmetry class."""
+
+    print("Collapsi Exact Win Rate Analysis (Perfect Play)")
+    print("=" * 50)
+
+    start_time = time.time()
+    classes = enumerate_deal_classes(size)
+    total_games = sum(classes.values())
+    print(f"{total_games} distinct deals fold into {len(classes)} symmetry classes "
+          f"({time.time() - start_time:.2f} seconds)\n")
+
+    player1_wins = 0
+    player2_wins = 0
+
+    items = list(classes.items())
+    tasks = [items[start:stop] for start, stop in _chunks(len(items), 1000)]
+    profiles = []
+    for deals, wins, chunk_profiles in _run_chunks(_solve_class_chunk, tasks, workers, total_games,
+                                                   "deals", tablebase_path, cache_entries, profile):
+        profiles.extend(chunk_profiles)
+        player1_wins += wins
+        player2_wins += deals - wins
+
+    end_time = time.time()
+
+    print(f"\nAnalysis complete in {end_time - start_time:.2f} seconds")
+    print("=" * 50)
+
+    print(f"\nOverall Statistics:")
+    print(f"Total distinct deals: {total_games}")
+    print(f"Symmetry classes solved: {len(classes)}")
+    print(f"Player 1 (first player) wins: {player1_wins} ({player1_wins/total_games*100:.4f}%)")
+    print(f"Player 2 (second player) wins: {player2_wins} ({player2_wins/total_games*100:.4f}%)")
+
+    print(f"\nFirst-Player Advantage: {(player1_wins/total_games - 0.5)*100:+.4f}%")
+    if profile:
+        report_profiles(profiles)
+
+
+def report_symmetry_gain(n_samples=1000, seed=0):
+    """Compare the solver with and without its symmetry-canonicalised cache.
+
+    Only deals whose value grid has a non-trivial automorphism can gain, so
+    those are reported one by one, followed by totals over all samples.
+    """
+
+    print("Symmetric Transposition Table Report")
+    print("=" * 50)
+
+    plain_ai = PerfectAIPlayer(0, use_symmetry=False)
+    symmetric_ai = PerfectAIPlayer(0)
+    totals = defaultdict(int)
+    symmetric_deals = 0
+
+    for sample_idx in range(n_samples):
+        game = sample_game(seed, sample_idx)
+
+        stats = []
+        for perfect_ai in (plain_ai, symmetric_ai):
+            perfect_ai._initialise_from_game(game)
+            collapsed_mask, p0_idx, p1_idx = perfect_ai._encode_board(game)
+            perfect_ai._solve(collapsed_mask, p0_idx, p1_idx, 0)
+            stats.append(perfect_ai.search_stats())
+
+        plain, symmetric = stats
+        for name in ("nodes", "cache_entries"):
+            totals[f"plain_{name}"] += plain[name]
+            totals[f"symmetric_{name}"] += symmetric[name]
+
+        if symmetric["automorphisms"]:
+            symmetric_deals += 1
+            print(f"Deal {sample_idx}: {symmetric['automorphisms']} automorphisms, "
+                  f"nodes {plain['nodes']} -> {symmetric['nodes']}, "
+                  f"cache entries {plain['cache_entries']} -> {symmetric['cache_entries']}, "
+                  f"hit rate {plain['hit_rate']*100:.1f}% -> {symmetric['hit_rate']*100:.1f}%")
+
+    print(f"\n{symmetric_deals}/{n_samples} deals have a non-trivial automorphism")
+    print(f"Total nodes: {totals['plain_nodes']} -> {totals['symmetric_nodes']} "
+          f"({(1 - totals['symmetric_nodes']/totals['plain_nodes'])*100:.2f}% saved)")
+    print(f"Total cache entries: {totals['plain_cache_entries']} -> {totals['symmetric_cache_entries']} "
+          f"({(1 - totals['symmetric_cache_entries']/totals['plain_cache_entries'])*100:.2f}% saved)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=10000,
+                        help="number of random deals to sample (default: 10000)")
+    parser.add_argument("--exhaustive", action="store_true",
+                        help="solve every distinct deal exactly instead of sampling")
+    parser.add_argument("--symmetry-report", action="store_true",
+                        help="report node and cache savings of the symmetric transposition table")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (default: 1)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the sampled deals (default: random, printed)")
+    parser.add_argument("--tablebase", metavar="PATH", default=None,
+                        help="read solved deals from, and record new ones in, this tablebase file")
+    parser.add_argument("--profile", action="store_true",
+                        help="record search statistics per deal and report totals and the slowest deals")
+    parser.add_argument("--profile-deal", type=int, metavar="N", default=None,
+                        help="cProfile a cold solve of sample N of --seed and print the report")
+    parser.add_argument("--pstats-out", metavar="PATH", default=None,
+                        help="with --profile-deal, also write the raw profile here")
+    parser.add_argument("--cache-entries", type=int, default=None,
+                        help="cap each worker's solver cache at this many states (default: unbounded)")
+    args = parser.parse_args()
+
+    if args.profile_deal is not None:
+        game = sample_game(args.seed or 0, args.profile_deal)
+        print(profile_deal(PerfectAIPlayer._deal_values(game), game.board.size,
+                           dump_path=args.pstats_out))
+    elif args.symmetry_report:
+        report_symmetry_gain(args.samples, args.seed or 0)
+    elif args.exhaustive:
+        analyze_win_rates_exhaustive(workers=args.workers, tablebase_path=args.tablebase,
+                                     cache_entries=args.cache_entries, profile=args.profile)
+    else:
+        analyze_win_rates_with_samples(args.samples, args.workers, args.seed, args.tablebase,
+                                       args.cache_entries, args.profile)
 
 
 if __name__ == "__main__":
-    # You can change the number of samples here
-    analyze_win_rates_with_samples(10000)
\ No newline at end of file
+    main()
\ No newline at end of file